@@ -3,8 +3,14 @@
 
 import adsk.core, adsk.fusion, traceback, math, random
 
-from . import patterns
 from . import pipe
+from . import primitives
+from . import weld
+from . import exporter
+from . import journal
+from . import csvparser
+from . import transform
+from . import prescan
 from enum import Enum
 
 # CONSTANTS
@@ -25,6 +31,7 @@ UNIT_STRINGS = {
 }
 
 _IMPORT_CSV_POINTS_CMD_ID = 'hanskellner_insert_csv_points_id'
+_EXPORT_CSV_POINTS_CMD_ID = 'hanskellner_export_csv_points_id'
 
 _INSERT_PANEL_ID = 'InsertPanel'
 
@@ -33,7 +40,29 @@ _DROPDOWN_INPUT_ID_STYLE = 'styleDropDownInputId'
 _SELECTION_INPUT_ID_SOLID_BODY = 'solidBodySelectionInputId'
 _SELECTION_INPUT_ID_SKETCH = 'sketchSelectionInputId'
 _DROPDOWN_INPUT_ID_CONSTRUCTION_PLANE = 'constructionPlaneDropDownInputId'
-
+_BOOL_INPUT_ID_DRY_RUN = 'dryRunBoolInputId'
+_BOOL_INPUT_ID_SELECT_FILE = 'selectFileBoolInputId'
+_TEXT_INPUT_ID_FILE_STATS = 'fileStatsTextInputId'
+_GROUP_INPUT_ID_TRANSFORM = 'transformGroupInputId'
+_VALUE_INPUT_ID_SCALE = 'scaleValueInputId'
+_VALUE_INPUT_ID_ROTATE_X = 'rotateXValueInputId'
+_VALUE_INPUT_ID_ROTATE_Y = 'rotateYValueInputId'
+_VALUE_INPUT_ID_ROTATE_Z = 'rotateZValueInputId'
+_VALUE_INPUT_ID_TRANSLATE_X = 'translateXValueInputId'
+_VALUE_INPUT_ID_TRANSLATE_Y = 'translateYValueInputId'
+_VALUE_INPUT_ID_TRANSLATE_Z = 'translateZValueInputId'
+_BOOL_INPUT_ID_MAP_TO_SKETCH = 'mapToSketchBoolInputId'
+_GROUP_INPUT_ID_COLUMNS = 'columnsGroupInputId'
+_STRING_INPUT_ID_COLUMN_X = 'columnXStringInputId'
+_STRING_INPUT_ID_COLUMN_Y = 'columnYStringInputId'
+_STRING_INPUT_ID_COLUMN_Z = 'columnZStringInputId'
+_STRING_INPUT_ID_COLUMN_SEGMENT = 'columnSegmentStringInputId'
+_DROPDOWN_INPUT_ID_EXPORT_UNIT = 'exportUnitDropDownInputId'
+_SELECTION_INPUT_ID_EXPORT_SKETCH = 'exportSketchSelectionInputId'
+
+
+# Number of bodies added per base feature in the Solid Body style
+_BODY_BATCH_SIZE = 250
 
 _CONSTRUCTION_PLANE_XY = "XY Plane"
 _CONSTRUCTION_PLANE_XZ = "XZ Plane"
@@ -54,6 +83,9 @@ _unit = 'cm'
 # File to load
 _csvFilename = ''
 
+# Pre-scan statistics of the file selected in the dialog
+_fileStats = None
+
 # Style of sketch entities to create
 _style = Sketch_Style.SKETCH_LINES
 
@@ -66,12 +98,34 @@ _selectedSketchName = ''
 # Which construction plane to place sketch when a sketch isn't specified
 _constructionPlane = _CONSTRUCTION_PLANE_XY
 
+# Only check the file and report, don't create anything
+_dryRun = False
+
+# Transform applied to all points after converting to 'cm': uniform scale, rotation
+# about X, Y, Z (radians) and translation ('cm')
+_transformScale = 1.0
+_transformRotation = (0.0, 0.0, 0.0)
+_transformTranslation = (0.0, 0.0, 0.0)
+
+# Map the points from model space into the sketch's coordinate system
+_mapToSketch = False
+
+# Columns holding X, Y, Z (and optionally segment breaks) in files with a header row
+_columnMapping = csvparser.ColumnMapping()
+
 # Command Inputs
 _unitDropDownInput = adsk.core.DropDownCommandInput.cast(None)
 _styleDropDownInput = adsk.core.DropDownCommandInput.cast(None)
 _sketchSelectionInput = adsk.core.SelectionCommandInput.cast(None)
 _constructionPlaneDropDownInput = adsk.core.DropDownCommandInput.cast(None)
 _solidBodySelectionInput = adsk.core.DropDownCommandInput.cast(None)
+_dryRunBoolInput = adsk.core.BoolValueCommandInput.cast(None)
+_mapToSketchBoolInput = adsk.core.BoolValueCommandInput.cast(None)
+_fileStatsTextInput = adsk.core.TextBoxCommandInput.cast(None)
+
+# Export Command Inputs
+_exportUnitDropDownInput = adsk.core.DropDownCommandInput.cast(None)
+_exportSketchSelectionInput = adsk.core.SelectionCommandInput.cast(None)
 
 
 # Get the selected sketch name; otherwise an empty string
@@ -113,13 +167,227 @@ def convertValue(value):
 
     return (True, newVal)
 
-# Returns total count of points in all lines
-def totalPointsInLines(lines):
-    count = 0
-    if lines != None:
-        for pts in lines:
-            count += len(pts)
-    return count
+# Returns the factor that converts a length in the user selected unit to 'cm'
+# Returns a pair (bool: True on success; otherwise false, Factor)
+def getUnitScale():
+    return convertValue(1.0)
+
+# Show the file dialog to choose a CSV file.  Returns the filename or '' if cancelled.
+def selectCsvFile():
+    fileDialog = _ui.createFileDialog()
+    fileDialog.isMultiSelectEnabled = False
+    fileDialog.title = "Select Points CSV File"
+    fileDialog.filter = 'CSV files (*.csv);;All files (*.*)'
+    fileDialog.filterIndex = 0
+    dialogResult = fileDialog.showOpen()
+    if dialogResult != adsk.core.DialogResults.DialogOK:
+        return ''
+
+    return fileDialog.filename
+
+# Show the pre-scan statistics of the selected file in the dialog
+def updateFileStatsText():
+    if _fileStats == None:
+        _fileStatsTextInput.formattedText = 'No file selected.  Select one to see what it contains before importing.'
+        return
+
+    report = ['<b>{}</b>'.format(_csvFilename)]
+    report.extend(prescan.formatStats(_fileStats, _unit))
+    _fileStatsTextInput.formattedText = '<br>'.join(report)
+
+# Returns a list of Point3D lists, one per segment of the PointStore
+def getLinePoints(pointStore):
+    createPoint = adsk.core.Point3D.create
+    xs = pointStore.xs
+    ys = pointStore.ys
+    zs = pointStore.zs
+
+    lines = []
+    for iSegment in range(pointStore.segmentCount()):
+        (start, end) = pointStore.segmentRange(iSegment)
+        lines.append([createPoint(xs[i], ys[i], zs[i]) for i in range(start, end)])
+    return lines
+
+# Group the timeline entries added since startPosition so the import shows up (and can be
+# rolled back or deleted) as a single item.  Does nothing in a direct modeling design.
+def groupTimeline(design, startPosition):
+    if design.designType != adsk.fusion.DesignTypes.ParametricDesignType:
+        return
+
+    timeline = design.timeline
+    endPosition = timeline.markerPosition - 1
+    if endPosition > startPosition:
+        timelineGroup = timeline.timelineGroups.add(startPosition, endPosition)
+        timelineGroup.name = 'Import CSV Points'
+
+# Create the sketch entities for all primitives in the store.  Each kind is emitted in a
+# single pass over its column indices so the per-kind API objects are looked up once.
+# Primitives before startIndex (in emission order) were created by a previous run.
+def drawPrimitives(theSketch, primitiveStore, progressDialog, startIndex = 0, importJournal = None):
+    sketchCurves = theSketch.sketchCurves
+    createPoint = adsk.core.Point3D.create
+
+    xs = primitiveStore.xs
+    ys = primitiveStore.ys
+    zs = primitiveStore.zs
+    radii = primitiveStore.radii
+
+    circleIndices = primitiveStore.indicesOf(primitives.PRIMITIVE_CIRCLE)
+    arcIndices = primitiveStore.indicesOf(primitives.PRIMITIVE_ARC)
+    polygonIndices = primitiveStore.indicesOf(primitives.PRIMITIVE_POLYGON)
+
+    progressDialog.show('Generating Primitives', 'Creating %v of %m (%p)', 0, len(primitiveStore), 1)
+    progressCount = startIndex
+
+    # Returns False when cancelled
+    def stepProgress():
+        if importJournal != None:
+            importJournal.checkpoint(journal.PHASE_PRIMITIVES, progressCount)
+        if progressCount % 100 == 0:
+            if progressDialog.wasCancelled:
+                return False
+            progressDialog.progressValue = progressCount
+        return True
+
+    # Circles
+    sketch_circles = sketchCurves.sketchCircles
+    for i in circleIndices[max(0, startIndex):]:
+        sketch_circles.addByCenterRadius(createPoint(xs[i], ys[i], zs[i]), radii[i])
+
+        progressCount += 1
+        if not stepProgress():
+            return
+
+    # Arcs
+    sketch_arcs = sketchCurves.sketchArcs
+    for i in arcIndices[max(0, startIndex - len(circleIndices)):]:
+        startAngle = primitiveStore.startAngles[i]
+        startPoint = createPoint(xs[i] + radii[i] * math.cos(startAngle), ys[i] + radii[i] * math.sin(startAngle), zs[i])
+        sketch_arcs.addByCenterStartSweep(createPoint(xs[i], ys[i], zs[i]), startPoint, primitiveStore.sweepAngles[i])
+
+        progressCount += 1
+        if not stepProgress():
+            return
+
+    # Polygons.  Consecutive edges share sketch points and the last edge closes on the first.
+    sketch_lines = sketchCurves.sketchLines
+    for i in polygonIndices[max(0, startIndex - len(circleIndices) - len(arcIndices)):]:
+        sides = primitiveStore.sides[i]
+        step = 2 * math.pi / sides
+        rotation = primitiveStore.startAngles[i]
+
+        theFirstSketchLine = None
+        theSketchLine = None
+        for iSide in range(1, sides + 1):
+            if iSide == sides:
+                lineEndPoint = theFirstSketchLine.startSketchPoint
+            else:
+                lineEndPoint = createPoint(xs[i] + radii[i] * math.cos(rotation + iSide * step), ys[i] + radii[i] * math.sin(rotation + iSide * step), zs[i])
+
+            if theSketchLine == None:
+                theSketchLine = sketch_lines.addByTwoPoints(createPoint(xs[i] + radii[i] * math.cos(rotation), ys[i] + radii[i] * math.sin(rotation), zs[i]), lineEndPoint)
+                theFirstSketchLine = theSketchLine
+            else:
+                theSketchLine = sketch_lines.addByTwoPoints(theSketchLine.endSketchPoint, lineEndPoint)
+
+        progressCount += 1
+        if not stepProgress():
+            return
+
+# Returns the number of sketch curves the current style draws for a segment of pointCount
+# points: one fitted spline, or a line between each pair of points.  Segments too short for
+# a curve get none, both when drawing and when finding the curves again.
+def getSegmentCurveCount(pointCount):
+    if Sketch_Style(_style) == Sketch_Style.SKETCH_FITTED_SPLINES:
+        return 1 if pointCount >= 2 else 0
+    if Sketch_Style(_style) == Sketch_Style.SKETCH_LINES:
+        return max(0, pointCount - 1)
+    return 0
+
+# Returns True if theSketch still holds everything the journal says a previous run drew.
+# An undo or a crash removes the entities but leaves the sketch and the journal, and
+# resuming then would silently leave out the work that was lost.
+# @arg segmentLengths : number of points in each segment
+def isSketchResumable(theSketch, segmentLengths, primitiveStore, importJournal):
+    names = importJournal.names
+    if any(name not in names for name in ('basePointCount', 'baseLineCount', 'baseSplineCount', 'baseCircleCount', 'baseArcCount')):
+        return False
+
+    # Segments drawn
+    segmentCount = len(segmentLengths) if importJournal.isPhaseComplete(journal.PHASE_SKETCH) else importJournal.startIndex(journal.PHASE_SKETCH)
+    curveCount = sum(getSegmentCurveCount(pointCount) for pointCount in segmentLengths[:segmentCount])
+    (expectedPoints, expectedLines, expectedSplines) = (0, 0, 0)
+    if Sketch_Style(_style) == Sketch_Style.SKETCH_POINTS:
+        expectedPoints = sum(segmentLengths[:segmentCount])
+    elif Sketch_Style(_style) == Sketch_Style.SKETCH_FITTED_SPLINES:
+        expectedSplines = curveCount
+    else:
+        expectedLines = curveCount
+
+    # Primitives drawn: circles, then arcs, then polygons (a line per side)
+    primitiveCount = len(primitiveStore) if importJournal.isPhaseComplete(journal.PHASE_PRIMITIVES) else importJournal.startIndex(journal.PHASE_PRIMITIVES)
+    circleCount = primitiveStore.count(primitives.PRIMITIVE_CIRCLE)
+    arcCount = primitiveStore.count(primitives.PRIMITIVE_ARC)
+    expectedCircles = min(primitiveCount, circleCount)
+    expectedArcs = min(max(0, primitiveCount - circleCount), arcCount)
+    polygonIndices = primitiveStore.indicesOf(primitives.PRIMITIVE_POLYGON)[:max(0, primitiveCount - circleCount - arcCount)]
+    expectedLines += sum(primitiveStore.sides[i] for i in polygonIndices)
+
+    # Curves also add sketch points, so the point count is only checked before any primitives
+    # are drawn.  After that the primitive counts show the earlier work is still there.
+    sketchCurves = theSketch.sketchCurves
+    if Sketch_Style(_style) == Sketch_Style.SKETCH_POINTS and primitiveCount == 0 and theSketch.sketchPoints.count - names['basePointCount'] != expectedPoints:
+        return False
+    return (sketchCurves.sketchLines.count - names['baseLineCount'] == expectedLines and
+            sketchCurves.sketchFittedSplines.count - names['baseSplineCount'] == expectedSplines and
+            sketchCurves.sketchCircles.count - names['baseCircleCount'] == expectedCircles and
+            sketchCurves.sketchArcs.count - names['baseArcCount'] == expectedArcs)
+
+# Returns True if the entities a previous run created, as recorded in the loaded journal,
+# are all still in the design
+def isResumable(rootComp, pointStore, primitiveStore, importJournal, isSolidBodyStyle):
+    if isSolidBodyStyle:
+        resumeComp = rootComp.parentDesign.allComponents.itemByName(importJournal.names.get('component', ''))
+        if resumeComp == None or rootComp.occurrencesByComponent(resumeComp).count == 0:
+            return False
+
+        # Points at the origin don't get a copy
+        startBody = importJournal.startIndex(journal.PHASE_BODIES)
+        copiedCount = sum(1 for iPt in range(startBody) if pointStore.xs[iPt] != 0 or pointStore.ys[iPt] != 0 or pointStore.zs[iPt] != 0)
+        return resumeComp.bRepBodies.count == copiedCount
+
+    theSketch = rootComp.sketches.itemByName(importJournal.names.get('sketch', ''))
+    return theSketch != None and isSketchResumable(theSketch, pointStore.segmentLengths(), primitiveStore, importJournal)
+
+# Returns the pipe paths for the segments drawn in theSketch by this import, found by
+# creation order.  Used when resuming, where the curves were created by a previous run.
+# @arg baseLineCount : number of sketch lines in the sketch before the import
+# @arg baseSplineCount : number of fitted splines in the sketch before the import
+def getSegmentPaths(theSketch, lines, baseLineCount, baseSplineCount):
+    paths = []
+
+    if Sketch_Style(_style) == Sketch_Style.SKETCH_FITTED_SPLINES:
+        sketch_splines = theSketch.sketchCurves.sketchFittedSplines
+        iSpline = baseSplineCount
+        for linePoints in lines:
+            if (linePoints == None or getSegmentCurveCount(len(linePoints)) == 0):
+                continue
+            paths.append(sketch_splines.item(iSpline))
+            iSpline += 1
+
+    elif Sketch_Style(_style) == Sketch_Style.SKETCH_LINES:
+        sketch_lines = theSketch.sketchCurves.sketchLines
+        iSketchLine = baseLineCount
+        for linePoints in lines:
+            if (linePoints == None or getSegmentCurveCount(len(linePoints)) == 0):
+                continue
+            segmentCurves = adsk.core.ObjectCollection.create()
+            for iCurve in range(getSegmentCurveCount(len(linePoints))):
+                segmentCurves.add(sketch_lines.item(iSketchLine))
+                iSketchLine += 1
+            paths.append(segmentCurves)
+
+    return paths
 
 # Event handler for the execute event.
 class MyCommandExecuteHandler(adsk.core.CommandEventHandler):
@@ -135,19 +403,11 @@ class MyCommandExecuteHandler(adsk.core.CommandEventHandler):
 
         try:
 
-            # Create file dialog to prompt for CSV file
-            fileDialog = _ui.createFileDialog()
-            fileDialog.isMultiSelectEnabled = False
-            fileDialog.title = "Select Points CSV File"
-            fileDialog.filter = 'CSV files (*.csv);;All files (*.*)'
-            fileDialog.filterIndex = 0
-            dialogResult = fileDialog.showOpen()
-            if dialogResult != adsk.core.DialogResults.DialogOK:
-                _csvFilename = ''
-                return
-
-            # This is our filename
-            _csvFilename = fileDialog.filename
+            # Prompt for the CSV file unless one was already selected in the dialog
+            if _csvFilename == '':
+                _csvFilename = selectCsvFile()
+                if _csvFilename == '':
+                    return
            
             # Set styles of progress dialog.
             progressDialog = _ui.createProgressDialog()
@@ -158,273 +418,182 @@ class MyCommandExecuteHandler(adsk.core.CommandEventHandler):
             # Show progress dialog
             progressDialog.show('Importing CSV', 'Loading... %v', 0, 1000, 1)
 
-            lineCount = 0
-            skippingBlanks = False # True when skipping a set of blank lines
-            
-            lines = []              # list of point lists
-            points3D = []           # Current Point3D list
-            CirclePoints3D = []     # Circle centre point list
-            CircleDiameters = []    # Circle diameter list
-
-            cmdCreatePipes = False
-            argCreatePipesOuterRadius = 1
-            argCreatePipesInnerRadius = 0.5     # > 0 means hollow 
-            
-            # Read the csv file line by line.
-            file = open(_csvFilename)
-            for line in file:
-                
-                line = line.strip()
-                
-                # Is this line empty?  Note, also check for the case where the line contains the separators but no values.
-                # This can occur when some apps, such as Excel, exports empty rows.
-                if line == '' or line == ',,' or line == ',':
-                    skippingBlanks = True
-
-                    # A blank line indicates a break in the point sequence and to start
-                    # a new set of points.  For example, for creating multiple lines.
-                    if len(points3D) > 0:
-                        lines.append(points3D)
-                        points3D = []
-
-                elif line[0] == '#':
-                    pass # Skip comment lines
-                
-                else:
-                    skippingBlanks = False
-                
-                    # Get the values from the csv file.
-                    pieces = line.split(',')
-
-                    if len(pieces) == 0:
-                        progressDialog.hide()
-                        _ui.messageBox("Invalid line: {}".format(lineCount) + "\nCSV file: {}".format(_csvFilename))
-                        return
-
-                    # check for a specific command in first piece
-                    if pieces[0] == 'spiral':
-
-                        # Need to end previous set?
-                        if len(points3D) > 0:
-                            lines.append(points3D)
-                            points3D = []
-
-                        # spiral needs 5 arguments: numArms, numPointsPerArm, armsOffset, rateExpansion, zStep
-                        if len(pieces) != 6:
-                            progressDialog.hide()
-                            _ui.messageBox("Invalid 'spiral' at line: {}".format(lineCount) + "\nCSV file: {}".format(_csvFilename))
-                            return
-                        
-                        linesSpiral = patterns.generateSpiral(int(pieces[1]), int(pieces[2]), float(pieces[3]), float(pieces[3]), float(pieces[3]))
-                        if linesSpiral == None:
-                            progressDialog.hide()
-                            _ui.messageBox("Invalid parameters for 'spiral' at line: {}".format(lineCount) + "\nCSV file: {}".format(_csvFilename))
-                            return
-                        
-                        lines.extend( linesSpiral )
-
-                    elif pieces[0] == 'spiralcube':
-
-                        # Need to end previous set?
-                        if len(points3D) > 0:
-                            lines.append(points3D)
-                            points3D = []
-
-                        # spiral cube needs 3 arguments: pointCount, rotationInRadians, lengthGrow
-                        if len(pieces) != 4:
-                            progressDialog.hide()
-                            _ui.messageBox("Invalid 'spiralcube' line: {}".format(lineCount) + "\nCSV file: {}".format(_csvFilename))
-                            return
-                        
-                        linesSpiralCube = patterns.generateSpiralCube(int(pieces[1]), float(pieces[2]), float(pieces[3]))
-                        if linesSpiralCube == None:
-                            progressDialog.hide()
-                            _ui.messageBox("Invalid parameters for 'spiralcube' at line: {}".format(lineCount) + "\nCSV file: {}".format(_csvFilename))
-                            return
-                        
-                        lines.extend( linesSpiralCube )
-
-                    # Command to create pipes for all of the lines/splines read
-                    # REVIEW: HACK: This is a hack to allow creating pipes.
-                    elif pieces[0] == 'pipes':
-
-                        # Need to end previous set?
-                        if len(points3D) > 0:
-                            lines.append(points3D)
-                            points3D = []
-
-                        # pipe needs 1 or 2 arguments: outer radius, [inner radius]
-                        if (len(pieces) < 2 or len(pieces) > 3):
-                            progressDialog.hide()
-                            _ui.messageBox("Invalid 'pipes' line: {}".format(lineCount) + "\nCSV file: {}".format(_csvFilename))
-                            return
-
-                        cmdCreatePipes = True
-                        (outerValid, argCreatePipesOuterRadius) = convertValue(float(pieces[1]))
-
-                        if (len(pieces) == 3):
-                            (innerValid, argCreatePipesInnerRadius) = convertValue(float(pieces[2]))
-                        else:
-                            (innerValid, argCreatePipesInnerRadius) = (True, 0)
-                        
-                        if not outerValid or not innerValid:
-                            progressDialog.hide()
-                            _ui.messageBox("Invalid pipes radius value at line: {}".format(lineCount) + "\nCSV file: {}".format(_csvFilename))
-                            return
-                            
-                    # Command to create circles
-                    elif pieces[0] == 'circle':
-
-                        # Need to end previous set?
-                        if len(points3D) > 0:
-                            lines.append(points3D)
-                            points3D = []
-
-                        # circle needs 3 or 4 arguments: center point [x, y, z] and radius
-                        if (len(pieces) < 4 or len(pieces) > 5):
-                            progressDialog.hide()
-                            _ui.messageBox("Invalid 'circle' line: {}".format(lineCount) + "\nCSV file: {}".format(_csvFilename))
-                            return
-
-                        (xValid, x) = convertValue(float(pieces[1]))
-                        (yValid, y) = convertValue(float(pieces[2]))
-
-                        if (len(pieces) == 4):
-                            (zValid, z) = (True, 0)
-                            (radiusValid, radius) = convertValue(float(pieces[3]))
-                        else:
-                            (zValid, z) = convertValue(float(pieces[3]))
-                            (radiusValid, radius) = convertValue(float(pieces[4]))
-                        
-                        if not xValid or not yValid or not zValid or not radiusValid:
-                            progressDialog.hide()
-                            _ui.messageBox("Invalid number at line: {}".format(lineCount) + "\nCSV file: {}".format(_csvFilename))
-                            return
-                        
-                        CirclePoints3D.append(adsk.core.Point3D.create(x,y,z))
-                        CircleDiameters.append(radius)
-                        
-                        if len(lines) == 0: #Workaround to add at least one point to lines for the script not to stop #TODO: Remove
-                            points3D.append(adsk.core.Point3D.create(0,0,0))
-                            lines.append(points3D)
-                            points3D = []
+            # Returns False to stop reading when the progress dialog is cancelled
+            def onParseProgress(lineNumber):
+                progressDialog.progressValue = (lineNumber // 1000) % 1000
+                return not progressDialog.wasCancelled
 
-                    else:
-                    
-                        if (len(pieces) < 2 or len(pieces) > 3):
-                            progressDialog.hide()
-                            _ui.messageBox("No 2d or 3d point at line: {}".format(lineCount) + "\nCSV file: {}".format(_csvFilename))
-                            return
-
-                        (xValid, x) = convertValue(float(pieces[0]))
-                        (yValid, y) = convertValue(float(pieces[1]))
-
-                        if (len(pieces) == 3):
-                            (zValid, z) = convertValue(float(pieces[2]))
-                        else:
-                            (zValid, z) = (True, 0)
-
-                        if not xValid or not yValid or not zValid:
-                            progressDialog.hide()
-                            _ui.messageBox("Invalid number at line: {}".format(lineCount) + "\nCSV file: {}".format(_csvFilename))
-                            return
-                        
-                        # Save this point
-                        points3D.append(adsk.core.Point3D.create(x,y,z))
-                    
-                lineCount = lineCount + 1
-
-                # If progress dialog is cancelled, stop drawing.
-                if progressDialog.wasCancelled:
-                    break
+            # Read the csv file.  All errors in the file are collected in one pass.
+            parseResult = csvparser.parseFile(_csvFilename, onProgress = onParseProgress, columns = _columnMapping)
 
-                # Update progress value of progress dialog
-                progressDialog.progressValue = lineCount % 100
-
-            # end line loop.  Check if a set if points waiting to be added.
-            if len(points3D) > 0:
-                lines.append(points3D)
-            
             # Hide the progress dialog at the end.
             progressDialog.hide()
 
+            if parseResult.cancelled:
+                return
+
+            # Only checking the file?  Report and leave the design untouched.
+            if _dryRun:
+                _ui.messageBox(csvparser.formatReport(parseResult, _csvFilename), 'Import CSV Points - Validate')
+                return
+
+            if parseResult.errorCount > 0:
+                _ui.messageBox(csvparser.formatReport(parseResult, _csvFilename), 'Import CSV Points - Errors')
+                return
+
+            # Convert everything from the file units to 'cm' in one pass
+            (scaleValid, unitScale) = getUnitScale()
+            if not scaleValid:
+                _ui.messageBox("Invalid unit: {}".format(_unit) + "\nCSV file: {}".format(_csvFilename))
+                return
+
+            pointStore = parseResult.points
+            pointStore.scale(unitScale)
+
+            # Primitives also drop coincident duplicates
+            primitiveStore = parseResult.primitives
+            primitiveStore.scale(unitScale)
+            primitiveStore.removeDuplicates()
+
+            # Command to create pipes for all of the lines/splines read
+            cmdCreatePipes = (parseResult.pipes != None)
+            if cmdCreatePipes:
+                argCreatePipesOuterRadius = parseResult.pipes[0] * unitScale
+                argCreatePipesInnerRadius = parseResult.pipes[1] * unitScale     # > 0 means hollow
+
+            # User transform from the dialog, applied to all coordinates at once
+            userTransform = transform.createTransform(_transformScale, *_transformRotation, *_transformTranslation)
+            transform.transformPointStore(userTransform, pointStore)
+            transform.transformPrimitiveStore(userTransform, primitiveStore)
+
             # Empty file then just exit
-            if len(lines) == 0:
+            if len(pointStore) == 0 and len(primitiveStore) == 0:
                 _ui.messageBox("No points found in CSV file: {}".format(_csvFilename))
                 return
 
-            # Creating solid bodies?
             isSolidBodyStyle = (Sketch_Style(_style) == Sketch_Style.SKETCH_SOLID_BODY)
+
+            # Offer to resume a previous import of the same file with the same options
+            importJournal = journal.ImportJournal(_csvFilename, {
+                'unit': _unit,
+                'style': Sketch_Style(_style).name,
+                'sketch': _selectedSketchName,
+                'plane': _constructionPlane,
+                'body': _solidBodyToClone.name if isSolidBodyStyle else '',
+                'transform': [_transformScale, *_transformRotation, *_transformTranslation, _mapToSketch],
+                'columns': _columnMapping.asList()
+            })
+            if importJournal.load() and isResumable(rootComp, pointStore, primitiveStore, importJournal, isSolidBodyStyle):
+                dialogResult = _ui.messageBox("A previous import of this file stopped during the '{}' step.\n\nResume from where it stopped?".format(importJournal.phase),
+                                              'Import CSV Points',
+                                              adsk.core.MessageBoxButtonTypes.YesNoButtonType,
+                                              adsk.core.MessageBoxIconTypes.QuestionIconType)
+                if dialogResult != adsk.core.DialogResults.DialogYes:
+                    importJournal.reset()
+            else:
+                importJournal.reset()
+
+            isImportComplete = False
+
+            # Where this import's timeline entries start
+            timelineStart = design.timeline.markerPosition if design.designType == adsk.fusion.DesignTypes.ParametricDesignType else 0
+
+            # Creating solid bodies?
             if isSolidBodyStyle:
 
-                totalPonts = totalPointsInLines(lines)
+                if len(pointStore) == 0:
+                    _ui.messageBox("No points found in CSV file: {}".format(_csvFilename))
+                    return
 
                 # Show progress dialog
-                progressDialog.show('Generating Bodies', 'Creating %v of %m (%p)', 0, totalPonts, 1)
+                progressDialog.show('Generating Bodies', 'Creating %v of %m (%p)', 0, len(pointStore), 1)
 
                 bodyToClone = adsk.fusion.BRepBody.cast(_solidBodyToClone)
 
-                bodyToClonePos = None
+                # Reuse the component of the import being resumed
+                newComp = None
+                startBody = importJournal.startIndex(journal.PHASE_BODIES)
+                if startBody > 0:
+                    resumeComp = design.allComponents.itemByName(importJournal.names.get('component', ''))
+                    if resumeComp != None and rootComp.occurrencesByComponent(resumeComp).count > 0:
+                        newComp = rootComp.occurrencesByComponent(resumeComp).item(0)
+                    else:
+                        startBody = 0
 
-                newComp = rootComp.occurrences.addNewComponent(adsk.core.Matrix3D.create())
-                newComp.component.name = 'Import CSV Points'
+                if newComp == None:
+                    newComp = rootComp.occurrences.addNewComponent(adsk.core.Matrix3D.create())
+                    newComp.component.name = 'Import CSV Points'
+                    importJournal.names['component'] = newComp.component.name
 
-                # Check to see if the body is in the root component or another one.
-                #target = None
-                if bodyToClone.assemblyContext:
-                    # It's in another component.
-                    target = bodyToClone.assemblyContext    # Occurrence
+                # Each body is a moved temporary copy of the prototype, added in batches.  In a
+                # parametric design a batch goes into a single base feature, so there's one
+                # timeline entry and one recompute per batch rather than a copy and a move
+                # feature for every body.
+                tempBRep = adsk.fusion.TemporaryBRepManager.get()
+                isParametric = (design.designType == adsk.fusion.DesignTypes.ParametricDesignType)
+                newBodies = newComp.component.bRepBodies
 
-                    # Where is the body located?
-                    bodyToClonePos = target.transform.translation
-                else:
-                    # It's in the root component.
-                    target = rootComp                       # Component
+                xs = pointStore.xs
+                ys = pointStore.ys
+                zs = pointStore.zs
 
-                for iLine in range(len(lines)):
+                for batchStart in range(startBody, len(pointStore), _BODY_BATCH_SIZE):
 
-                    if (lines[iLine] == None or len(lines[iLine]) == 0):
-                        continue
+                    batchEnd = min(batchStart + _BODY_BATCH_SIZE, len(pointStore))
 
-                    # For each point, create a copy of the prototype body
-                    linePoints = lines[iLine]
-                    for iPt in range(len(linePoints)):
+                    baseFeature = None
+                    if isParametric:
+                        baseFeature = newComp.component.features.baseFeatures.add()
+                        baseFeature.startEdit()
 
-                        pt = linePoints[iPt]
+                    for iPt in range(batchStart, batchEnd):
 
                         # If point is not at 0 then copy body and move to location
                         # Otherwise, keep the existing object so we don't
-                        if (pt.x != 0 or pt.y != 0 or pt.z != 0):
+                        if (xs[iPt] != 0 or ys[iPt] != 0 or zs[iPt] != 0):
 
-                            # Create the copy.
-                            newBody = bodyToClone.copyToComponent(newComp) #target)
-
-                            # Move the mew body (note, relative move)
+                            # Create the copy and move it (note, relative move)
+                            newBody = tempBRep.copy(bodyToClone)
                             tx = adsk.core.Matrix3D.create()
-                            tx.translation = adsk.core.Vector3D.create(pt.x, pt.y, pt.z)
-                            bodyColl = adsk.core.ObjectCollection.create()
-                            bodyColl.add(newBody)
-                            moveInput = rootComp.features.moveFeatures.createInput(bodyColl, tx)
-                            moveFeat = rootComp.features.moveFeatures.add(moveInput)
+                            tx.translation = adsk.core.Vector3D.create(xs[iPt], ys[iPt], zs[iPt])
+                            tempBRep.transform(newBody, tx)
 
-                        # If progress dialog is cancelled, stop drawing.
-                        if progressDialog.wasCancelled:
-                            break
+                            if baseFeature != None:
+                                addedBody = newBodies.add(newBody, baseFeature)
+                            else:
+                                addedBody = newBodies.add(newBody)
 
-                        # Update progress value of progress dialog
-                        progressDialog.progressValue = iLine
+                            # Temporary copies are plain geometry.  Keep the look of the prototype.
+                            # The material is set first because it also sets the appearance.
+                            addedBody.material = bodyToClone.material
+                            addedBody.appearance = bodyToClone.appearance
+
+                    if baseFeature != None:
+                        baseFeature.finishEdit()
 
+                    importJournal.checkpoint(journal.PHASE_BODIES, batchEnd)
+
+                    # If progress dialog is cancelled, stop drawing.
                     if progressDialog.wasCancelled:
                         break
 
+                    # Update progress value of progress dialog
+                    progressDialog.progressValue = batchEnd
+
             else:   # Sketch based
 
                 # Show progress dialog
-                progressDialog.show('Generating Entities', 'Creating %v of %m (%p)', 0, len(lines), 1)
+                progressDialog.show('Generating Entities', 'Creating %v of %m (%p)', 0, pointStore.segmentCount(), 1)
 
                 theSketch = None
 
-                if _selectedSketchName != '':
+                # Reuse the sketch of the import being resumed
+                if importJournal.phase != None:
+                    theSketch = rootComp.sketches.itemByName(importJournal.names.get('sketch', ''))
+                    if theSketch == None:
+                        importJournal.reset()
+
+                if theSketch == None and _selectedSketchName != '':
                     theSketch = rootComp.sketches.itemByName(_selectedSketchName)
                 
                 if theSketch == None:
@@ -439,6 +608,29 @@ class MyCommandExecuteHandler(adsk.core.CommandEventHandler):
                     theSketch = rootComp.sketches.add(plane)
                     theSketch.name = "CSV Points - " + theSketch.name
 
+                # Remember how to find this import's entities if it needs to be resumed
+                if importJournal.phase == None:
+                    importJournal.names['sketch'] = theSketch.name
+                    importJournal.names['basePointCount'] = theSketch.sketchPoints.count
+                    importJournal.names['baseLineCount'] = theSketch.sketchCurves.sketchLines.count
+                    importJournal.names['baseSplineCount'] = theSketch.sketchCurves.sketchFittedSplines.count
+                    importJournal.names['baseCircleCount'] = theSketch.sketchCurves.sketchCircles.count
+                    importJournal.names['baseArcCount'] = theSketch.sketchCurves.sketchArcs.count
+
+                # Map model space coordinates into the sketch.  This is the same as calling
+                # theSketch.modelToSketchSpace() for every point, done once for the whole set.
+                if _mapToSketch:
+                    modelToSketch = theSketch.transform.copy()
+                    modelToSketch.invert()
+                    sketchTransform = transform.fromMatrix4(modelToSketch.asArray())
+                    transform.transformPointStore(sketchTransform, pointStore)
+                    transform.transformPrimitiveStore(sketchTransform, primitiveStore)
+
+                lines = getLinePoints(pointStore)
+
+                isResumed = (importJournal.phase != None)
+                startSegment = len(lines) if importJournal.isPhaseComplete(journal.PHASE_SKETCH) else importJournal.startIndex(journal.PHASE_SKETCH)
+
                 theSketch.isComputeDeferred = True  # Help to speed up import
                 wereProfilesShown = theSketch.areProfilesShown # REVIEW: Still testing if this improves performace
                 theSketch.areProfilesShown = False
@@ -448,9 +640,10 @@ class MyCommandExecuteHandler(adsk.core.CommandEventHandler):
                 # Add sketch entities
                 if Sketch_Style(_style) == Sketch_Style.SKETCH_FITTED_SPLINES:
 
-                    for iLine in range(len(lines)):
+                    for iLine in range(startSegment, len(lines)):
 
-                        if (lines[iLine] == None or len(lines[iLine]) == 0):
+                        # A spline needs at least two points
+                        if (lines[iLine] == None or getSegmentCurveCount(len(lines[iLine])) == 0):
                             continue
 
                         # Create an object collection for the line points.
@@ -464,6 +657,8 @@ class MyCommandExecuteHandler(adsk.core.CommandEventHandler):
                         theSketchLine = theSketch.sketchCurves.sketchFittedSplines.add(linePoints)
                         new_sketch_lines.append(theSketchLine)
 
+                        importJournal.checkpoint(journal.PHASE_SKETCH, iLine + 1)
+
                         # If progress dialog is cancelled, stop drawing.
                         if progressDialog.wasCancelled:
                             break
@@ -475,12 +670,32 @@ class MyCommandExecuteHandler(adsk.core.CommandEventHandler):
                     sketch_points = theSketch.sketchPoints
                     sketch_lines = theSketch.sketchCurves.sketchLines
 
-                    for iLine in range(len(lines)):
+                    # Segment endpoints that coincide with an endpoint of any earlier segment
+                    # (including the start of the same segment) share one sketch point.
+                    welder = weld.EndpointWelder()
+
+                    # When resuming, the segment endpoints drawn by the previous run need to be in the
+                    # index.  Only those, found by creation order, so the result is the same as one run.
+                    if isResumed and startSegment < len(lines) and Sketch_Style(_style) == Sketch_Style.SKETCH_LINES:
+                        iSketchLine = importJournal.names['baseLineCount']
+                        for linePoints in lines[:startSegment]:
+                            curveCount = getSegmentCurveCount(len(linePoints)) if linePoints != None else 0
+                            if curveCount == 0:
+                                continue
+                            segmentStartPoint = sketch_lines.item(iSketchLine).startSketchPoint
+                            segmentEndPoint = sketch_lines.item(iSketchLine + curveCount - 1).endSketchPoint
+                            welder.addPoint(segmentStartPoint.geometry, segmentStartPoint)
+                            welder.addPoint(segmentEndPoint.geometry, segmentEndPoint)
+                            iSketchLine += curveCount
+
+                    for iLine in range(startSegment, len(lines)):
 
                         if (lines[iLine] == None or len(lines[iLine]) == 0):
                             continue
 
-                        theFirstSketchLine = None
+                        segmentCurves = None
+                        if cmdCreatePipes and Sketch_Style(_style) == Sketch_Style.SKETCH_LINES:
+                            segmentCurves = adsk.core.ObjectCollection.create()
 
                         linePoints = lines[iLine]
                         linePointsCount = len(linePoints)
@@ -489,25 +704,40 @@ class MyCommandExecuteHandler(adsk.core.CommandEventHandler):
                             if Sketch_Style(_style) == Sketch_Style.SKETCH_POINTS:
                                 sketch_points.add(linePoints[iPt])
                             
-                            elif Sketch_Style(_style) == Sketch_Style.SKETCH_LINES:
+                            elif Sketch_Style(_style) == Sketch_Style.SKETCH_LINES and iPt > 0:
+                                # Use previous sketch line's end point to start next line.  Otherwise they won't
+                                # be connected lines.  The first and last points of the segment are looked up
+                                # in the weld index so strokes sharing an endpoint are connected as well.
+                                lineStartPoint = None
                                 if iPt == 1:
-                                    theSketchLine = sketch_lines.addByTwoPoints(linePoints[iPt-1], linePoints[iPt])
-                                    new_sketch_lines.append(theSketchLine)
-                                    theFirstSketchLine = theSketchLine
-                                if iPt > 1:
-                                    # Use previous sketch line's end point to start next line.  Otherwise they won't
-                                    # be connected lines.  We also need to check if this is the last line and if it
-                                    # has the same endpoint location as the first line's start point.  If so then we
-                                    # need to use the starting lines point as the endpoint of this line.
-                                    lineEndPoint = None
-                                    if linePoints[iPt].x == linePoints[0].x and linePoints[iPt].y == linePoints[0].y and linePoints[iPt].z == linePoints[0].z:
-                                        lineEndPoint = theFirstSketchLine.startSketchPoint
-                                    else:
-                                        lineEndPoint = linePoints[iPt]
-
-                                    theSketchLine = sketch_lines.addByTwoPoints(theSketchLine.endSketchPoint, lineEndPoint)
-                                    # REVIEW: Only pass first line and then use "isChain" when creating feature.path
-                                    #new_sketch_lines.append(theSketchLine)
+                                    lineStartPoint = welder.findPoint(linePoints[0])
+                                    isStartWelded = (lineStartPoint != None)
+                                    if not isStartWelded:
+                                        lineStartPoint = linePoints[0]
+                                else:
+                                    lineStartPoint = theSketchLine.endSketchPoint
+
+                                lineEndPoint = None
+                                isLastPoint = (iPt == linePointsCount - 1)
+                                if isLastPoint:
+                                    lineEndPoint = welder.findPoint(linePoints[iPt])
+                                isEndWelded = (lineEndPoint != None)
+                                if not isEndWelded:
+                                    lineEndPoint = linePoints[iPt]
+
+                                theSketchLine = sketch_lines.addByTwoPoints(lineStartPoint, lineEndPoint)
+
+                                if iPt == 1:
+                                    new_sketch_lines.append(theSketchLine if segmentCurves == None else segmentCurves)
+                                    if not isStartWelded:
+                                        welder.addPoint(linePoints[0], theSketchLine.startSketchPoint)
+                                if isLastPoint and not isEndWelded:
+                                    welder.addPoint(linePoints[iPt], theSketchLine.endSketchPoint)
+
+                                if segmentCurves != None:
+                                    segmentCurves.add(theSketchLine)
+
+                        importJournal.checkpoint(journal.PHASE_SKETCH, iLine + 1)
 
                         # If progress dialog is cancelled, stop drawing.
                         if progressDialog.wasCancelled:
@@ -516,19 +746,45 @@ class MyCommandExecuteHandler(adsk.core.CommandEventHandler):
                         # Update progress value of progress dialog
                         progressDialog.progressValue = iLine
  
-                # Draw circles
-                if len(CirclePoints3D) > 0:
-                    sketch_circles = theSketch.sketchCurves.sketchCircles
-                    for iPt in range(len(CirclePoints3D)):
-                        sketch_circles.addByCenterRadius(CirclePoints3D[iPt], CircleDiameters[iPt])
+                # Draw circles, arcs and polygons
+                if len(primitiveStore) > 0 and not progressDialog.wasCancelled and not importJournal.isPhaseComplete(journal.PHASE_PRIMITIVES):
+                    drawPrimitives(theSketch, primitiveStore, progressDialog, importJournal.startIndex(journal.PHASE_PRIMITIVES), importJournal)
 
                 # Done creating sketch entities
                 theSketch.isComputeDeferred = False
                 theSketch.areProfilesShown = wereProfilesShown
 
                 # Request to create pipes and were any skecth lines added?
-                if cmdCreatePipes and len(new_sketch_lines) > 0:
-                    pipe.createPipesOnLines(_app, _ui, new_sketch_lines, argCreatePipesOuterRadius, argCreatePipesInnerRadius)
+                if cmdCreatePipes and not progressDialog.wasCancelled:
+
+                    # Some of the curves were created by the run being resumed
+                    if isResumed:
+                        new_sketch_lines = getSegmentPaths(theSketch, lines, importJournal.names['baseLineCount'], importJournal.names['baseSplineCount'])
+
+                    if len(new_sketch_lines) > 0:
+                        progressDialog.show('Generating Pipes', 'Creating %v of %m (%p)', 0, len(new_sketch_lines), 1)
+
+                        # Pipe bodies are added after the bodies that are already there
+                        if 'basePipeBodyCount' not in importJournal.names:
+                            importJournal.names['basePipeBodyCount'] = rootComp.bRepBodies.count
+
+                        # The pipes are the last step, so once they're all created the import is complete
+                        # even if Cancel was pressed during the last one.
+                        isImportComplete = pipe.createPipesOnLines(_app, _ui, new_sketch_lines, argCreatePipesOuterRadius, argCreatePipesInnerRadius,
+                                                                   importJournal.startIndex(journal.PHASE_PIPES),
+                                                                   lambda count: importJournal.checkpoint(journal.PHASE_PIPES, count),
+                                                                   progressDialog)
+                        if isImportComplete:
+                            pipe.combinePipeBodies(_app, importJournal.names['basePipeBodyCount'])
+
+            # Everything this import added to the timeline is one group
+            groupTimeline(design, timelineStart)
+
+            # Keep the checkpoint if cancelled so the next run can resume; otherwise the import is complete.
+            if progressDialog.wasCancelled and not isImportComplete:
+                importJournal.flush()
+            else:
+                importJournal.clear()
 
             # Hide the progress dialog at the end.
             progressDialog.hide()
@@ -543,7 +799,9 @@ class MyCommandInputChangedHandler(adsk.core.InputChangedEventHandler):
         super().__init__()
     def notify(self, args):
         try:
-            global _app, _ui, _unit, _style, _constructionPlane, _selectedSketchName, _solidBodyToClone
+            global _app, _ui, _unit, _style, _constructionPlane, _selectedSketchName, _solidBodyToClone, _dryRun
+            global _transformScale, _transformRotation, _transformTranslation, _mapToSketch, _columnMapping
+            global _csvFilename, _fileStats
             global _constructionPlaneDropDownInput, _unitDropDownInput, _styleDropDownInput
 
             des = adsk.fusion.Design.cast(_app.activeProduct)
@@ -574,10 +832,52 @@ class MyCommandInputChangedHandler(adsk.core.InputChangedEventHandler):
                     if valUnit == unitName:
                         _unit = keyUnit
                         break
+                updateFileStatsText()
+
+            elif changedInput.id == _BOOL_INPUT_ID_SELECT_FILE:
+                # Scan the file right away so its size and contents can guide the choice of style and units
+                filename = selectCsvFile()
+                if filename != '':
+                    _csvFilename = filename
+                    _fileStats = prescan.scanFile(_csvFilename, _columnMapping)
+                    updateFileStatsText()
             
             elif changedInput.id == _DROPDOWN_INPUT_ID_STYLE:
                 pass
 
+            elif changedInput.id == _BOOL_INPUT_ID_DRY_RUN:
+                _dryRun = _dryRunBoolInput.value
+
+            elif changedInput.id == _VALUE_INPUT_ID_SCALE:
+                _transformScale = changedInput.value
+
+            elif changedInput.id in [_VALUE_INPUT_ID_ROTATE_X, _VALUE_INPUT_ID_ROTATE_Y, _VALUE_INPUT_ID_ROTATE_Z]:
+                _transformRotation = (inputs.itemById(_VALUE_INPUT_ID_ROTATE_X).value,
+                                      inputs.itemById(_VALUE_INPUT_ID_ROTATE_Y).value,
+                                      inputs.itemById(_VALUE_INPUT_ID_ROTATE_Z).value)
+
+            elif changedInput.id in [_VALUE_INPUT_ID_TRANSLATE_X, _VALUE_INPUT_ID_TRANSLATE_Y, _VALUE_INPUT_ID_TRANSLATE_Z]:
+                _transformTranslation = (inputs.itemById(_VALUE_INPUT_ID_TRANSLATE_X).value,
+                                         inputs.itemById(_VALUE_INPUT_ID_TRANSLATE_Y).value,
+                                         inputs.itemById(_VALUE_INPUT_ID_TRANSLATE_Z).value)
+
+            elif changedInput.id == _BOOL_INPUT_ID_MAP_TO_SKETCH:
+                _mapToSketch = _mapToSketchBoolInput.value
+
+            elif changedInput.id in [_STRING_INPUT_ID_COLUMN_X, _STRING_INPUT_ID_COLUMN_Y, _STRING_INPUT_ID_COLUMN_Z, _STRING_INPUT_ID_COLUMN_SEGMENT]:
+                _columnMapping = csvparser.ColumnMapping(inputs.itemById(_STRING_INPUT_ID_COLUMN_X).value,
+                                                         inputs.itemById(_STRING_INPUT_ID_COLUMN_Y).value,
+                                                         inputs.itemById(_STRING_INPUT_ID_COLUMN_Z).value,
+                                                         inputs.itemById(_STRING_INPUT_ID_COLUMN_SEGMENT).value)
+                # Only rescan once the mapping gives different columns, not on every keystroke
+                if _fileStats != None:
+                    try:
+                        if prescan.resolveColumns(_fileStats, _columnMapping) != _fileStats.columns:
+                            _fileStats = prescan.scanFile(_csvFilename, _columnMapping)
+                        updateFileStatsText()
+                    except ValueError as err:
+                        _fileStatsTextInput.formattedText = '<b>{}</b><br>{}'.format(_csvFilename, err)
+
             # Update visiblity/enabled
 
             _solidBodySelectionInput.isVisible = isSolidBodyStyle
@@ -591,6 +891,8 @@ class MyCommandInputChangedHandler(adsk.core.InputChangedEventHandler):
             _constructionPlaneDropDownInput.isVisible = not isSolidBodyStyle
             _constructionPlaneDropDownInput.isEnabled = (_selectedSketchName == '')
 
+            _mapToSketchBoolInput.isVisible = not isSolidBodyStyle
+
         except:
             _ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
 
@@ -617,7 +919,8 @@ class MyCommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
     def notify(self, args):
         try:
             global _app, _ui, _handlers, _unit, _csvFilename
-            global _unitDropDownInput, _styleDropDownInput, _sketchSelectionInput, _constructionPlaneDropDownInput, _solidBodySelectionInput
+            global _unitDropDownInput, _styleDropDownInput, _sketchSelectionInput, _constructionPlaneDropDownInput, _solidBodySelectionInput, _dryRunBoolInput
+            global _mapToSketchBoolInput, _fileStatsTextInput, _fileStats
 
             design = _app.activeProduct
             if not design:
@@ -640,6 +943,10 @@ class MyCommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
             # Get the user's current units
             _unit = design.unitsManager.defaultLengthUnits
 
+            # No file selected yet for this run of the command
+            _csvFilename = ''
+            _fileStats = None
+
             # Get the CommandInputs collection associated with the command.
             inputs = cmd.commandInputs
 
@@ -651,6 +958,13 @@ class MyCommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
             for keyUnit, valUnit in UNIT_STRINGS.items():
                 _unitDropDownInput.listItems.add(valUnit, (_unit == keyUnit))
 
+            # Optional: Select the file here to see its statistics before choosing the style and units.
+            # Otherwise the file is selected after clicking OK.
+            selectFileInput = inputs.addBoolValueInput(_BOOL_INPUT_ID_SELECT_FILE, 'CSV File', False, '', False)
+            selectFileInput.text = 'Select...'
+            _fileStatsTextInput = inputs.addTextBoxCommandInput(_TEXT_INPUT_ID_FILE_STATS, 'File Info', '', 8, True)
+            updateFileStatsText()
+
             isSolidBodyStyle = (Sketch_Style(_style) == Sketch_Style.SKETCH_SOLID_BODY)
 
             # Dropdown for the type of sketch entity to create
@@ -679,6 +993,38 @@ class MyCommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
             _constructionPlaneDropDownInput.listItems.add(_CONSTRUCTION_PLANE_YZ, (_constructionPlane == _CONSTRUCTION_PLANE_YZ))
             _constructionPlaneDropDownInput.isVisible = not isSolidBodyStyle
 
+            # Column mapping for files with a header row.  Columns can be given by header name or number.
+            columnsGroupInput = inputs.addGroupCommandInput(_GROUP_INPUT_ID_COLUMNS, 'Columns')
+            columnsGroupInput.isExpanded = False
+            columnsInputs = columnsGroupInput.children
+
+            columnsInputs.addStringValueInput(_STRING_INPUT_ID_COLUMN_X, 'X Column', _columnMapping.x)
+            columnsInputs.addStringValueInput(_STRING_INPUT_ID_COLUMN_Y, 'Y Column', _columnMapping.y)
+            columnsInputs.addStringValueInput(_STRING_INPUT_ID_COLUMN_Z, 'Z Column', _columnMapping.z)
+            segmentColumnInput = columnsInputs.addStringValueInput(_STRING_INPUT_ID_COLUMN_SEGMENT, 'Segment Column', _columnMapping.segmentBy)
+            segmentColumnInput.tooltip = 'Optional column that starts a new set of points whenever its value changes'
+
+            # Transform applied to the points.  Collapsed by default since it's usually not needed.
+            transformGroupInput = inputs.addGroupCommandInput(_GROUP_INPUT_ID_TRANSFORM, 'Transform')
+            transformGroupInput.isExpanded = False
+            transformInputs = transformGroupInput.children
+
+            transformInputs.addValueInput(_VALUE_INPUT_ID_SCALE, 'Scale', '', adsk.core.ValueInput.createByReal(_transformScale))
+            transformInputs.addValueInput(_VALUE_INPUT_ID_ROTATE_X, 'Rotate X', 'deg', adsk.core.ValueInput.createByReal(_transformRotation[0]))
+            transformInputs.addValueInput(_VALUE_INPUT_ID_ROTATE_Y, 'Rotate Y', 'deg', adsk.core.ValueInput.createByReal(_transformRotation[1]))
+            transformInputs.addValueInput(_VALUE_INPUT_ID_ROTATE_Z, 'Rotate Z', 'deg', adsk.core.ValueInput.createByReal(_transformRotation[2]))
+            transformInputs.addValueInput(_VALUE_INPUT_ID_TRANSLATE_X, 'Move X', design.unitsManager.defaultLengthUnits, adsk.core.ValueInput.createByReal(_transformTranslation[0]))
+            transformInputs.addValueInput(_VALUE_INPUT_ID_TRANSLATE_Y, 'Move Y', design.unitsManager.defaultLengthUnits, adsk.core.ValueInput.createByReal(_transformTranslation[1]))
+            transformInputs.addValueInput(_VALUE_INPUT_ID_TRANSLATE_Z, 'Move Z', design.unitsManager.defaultLengthUnits, adsk.core.ValueInput.createByReal(_transformTranslation[2]))
+
+            _mapToSketchBoolInput = transformInputs.addBoolValueInput(_BOOL_INPUT_ID_MAP_TO_SKETCH, 'Map Into Sketch Plane', True, '', _mapToSketch)
+            _mapToSketchBoolInput.tooltip = 'Treat the points as model coordinates and map them into the sketch plane'
+            _mapToSketchBoolInput.isVisible = not isSolidBodyStyle
+
+            # Check the file for errors and report what's in it without importing
+            _dryRunBoolInput = inputs.addBoolValueInput(_BOOL_INPUT_ID_DRY_RUN, 'Validate Only', True, '', _dryRun)
+            _dryRunBoolInput.tooltip = 'Read the file and report errors and statistics without creating anything'
+
             # Setup event handlers
             onExecute = MyCommandExecuteHandler()
             cmd.execute.add(onExecute)
@@ -688,6 +1034,92 @@ class MyCommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
             _ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
 
 
+# Event handler for the export command's execute event.
+class MyExportCommandExecuteHandler(adsk.core.CommandEventHandler):
+    def __init__(self):
+        super().__init__()
+    def notify(self, args):
+        try:
+            theSketch = adsk.fusion.Sketch.cast(_exportSketchSelectionInput.selection(0).entity)
+
+            exportUnit = 'cm'
+            for keyUnit, valUnit in UNIT_STRINGS.items():
+                if valUnit == _exportUnitDropDownInput.selectedItem.name:
+                    exportUnit = keyUnit
+                    break
+
+            # Create file dialog to prompt for CSV file
+            fileDialog = _ui.createFileDialog()
+            fileDialog.title = "Save Points CSV File"
+            fileDialog.filter = 'CSV files (*.csv);;All files (*.*)'
+            fileDialog.filterIndex = 0
+            fileDialog.initialFilename = theSketch.name + '.csv'
+            dialogResult = fileDialog.showSave()
+            if dialogResult != adsk.core.DialogResults.DialogOK:
+                return
+
+            exportFilename = fileDialog.filename
+
+            # Single conversion factor from the internal 'cm' to the chosen unit
+            design = _app.activeProduct
+            unitScale = design.unitsManager.convert(1.0, 'cm', exportUnit)
+
+            progressDialog = _ui.createProgressDialog()
+            progressDialog.cancelButtonText = 'Cancel'
+            progressDialog.isBackgroundTranslucent = False
+            progressDialog.isCancelButtonShown = True
+            progressDialog.show('Exporting CSV', 'Reading %v of %m lines', 0, theSketch.sketchCurves.sketchLines.count, 1)
+
+            (segments, primitiveStore) = exporter.collectSketchGeometry(theSketch, progressDialog)
+
+            if progressDialog.wasCancelled:
+                progressDialog.hide()
+                return
+
+            progressDialog.hide()
+
+            exporter.writeCsv(exportFilename, segments, primitiveStore, unitScale, exportUnit)
+
+        except:
+            _ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+
+
+# Event handler that creates the export command and its inputs.
+class MyExportCommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
+    def __init__(self):
+        super().__init__()
+    def notify(self, args):
+        try:
+            global _exportUnitDropDownInput, _exportSketchSelectionInput
+
+            design = _app.activeProduct
+            if not design:
+                _ui.messageBox('No active Fusion design', 'No Design')
+                return
+
+            cmd = adsk.core.Command.cast(args.command)
+            inputs = cmd.commandInputs
+
+            defaultUnit = design.unitsManager.defaultLengthUnits
+
+            # Dropdown for unit to write in the CSV file
+            _exportUnitDropDownInput = inputs.addDropDownCommandInput(_DROPDOWN_INPUT_ID_EXPORT_UNIT, 'Units', adsk.core.DropDownStyles.TextListDropDownStyle)
+            for keyUnit, valUnit in UNIT_STRINGS.items():
+                _exportUnitDropDownInput.listItems.add(valUnit, (defaultUnit == keyUnit))
+
+            # Sketch to export
+            _exportSketchSelectionInput = inputs.addSelectionInput(_SELECTION_INPUT_ID_EXPORT_SKETCH, 'Sketch', 'Select the sketch to export')
+            _exportSketchSelectionInput.addSelectionFilter('Sketches')
+            _exportSketchSelectionInput.setSelectionLimits(1, 1)
+
+            onExecute = MyExportCommandExecuteHandler()
+            cmd.execute.add(onExecute)
+            _handlers.append(onExecute)
+
+        except:
+            _ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+
+
 def run(context):
     try:
         global _app, _ui, _handlers
@@ -705,17 +1137,27 @@ def run(context):
         cmdDef.commandCreated.add(onCommandCreated)
         _handlers.append(onCommandCreated)
 
+        # Same for the export command
+        exportCmdDef = _ui.commandDefinitions.itemById(_EXPORT_CSV_POINTS_CMD_ID)
+        if not exportCmdDef:
+            exportCmdDef = _ui.commandDefinitions.addButtonDefinition(_EXPORT_CSV_POINTS_CMD_ID, 'Export CSV Points', 'Exports the points, lines, and splines of a sketch to a CSV file.', './resources')
+
+        onExportCommandCreated = MyExportCommandCreatedHandler()
+        exportCmdDef.commandCreated.add(onExportCommandCreated)
+        _handlers.append(onExportCommandCreated)
+
         # Get the INSERT panel in the MODEL workspace. 
         insertPanel = _ui.allToolbarPanels.itemById(_INSERT_PANEL_ID)
 
-        # Add button to the panel
-        btnControl = insertPanel.controls.itemById(_IMPORT_CSV_POINTS_CMD_ID)
-        if not btnControl:
-            btnControl = insertPanel.controls.addCommand(cmdDef)
+        # Add buttons to the panel
+        for theCmdDef in [cmdDef, exportCmdDef]:
+            btnControl = insertPanel.controls.itemById(theCmdDef.id)
+            if not btnControl:
+                btnControl = insertPanel.controls.addCommand(theCmdDef)
 
-            # Make the button available in the panel.
-            btnControl.isPromotedByDefault = False
-            btnControl.isPromoted = False
+                # Make the button available in the panel.
+                btnControl.isPromotedByDefault = False
+                btnControl.isPromoted = False
         
         if context['IsApplicationStartup'] is False:
             _ui.messageBox('The "Insert CSV Points" command has been\nadded to the INSERT panel dropdown.')
@@ -729,13 +1171,14 @@ def stop(context):
         # Delete controls and associated command definitions created by this add-ins
         insertPanel = _ui.allToolbarPanels.itemById(_INSERT_PANEL_ID)
         
-        btnControl = insertPanel.controls.itemById(_IMPORT_CSV_POINTS_CMD_ID)
-        if btnControl:
-            btnControl.deleteMe()
-        
-        cmdDef = _ui.commandDefinitions.itemById(_IMPORT_CSV_POINTS_CMD_ID)
-        if cmdDef:
-            cmdDef.deleteMe() 
+        for cmdId in [_IMPORT_CSV_POINTS_CMD_ID, _EXPORT_CSV_POINTS_CMD_ID]:
+            btnControl = insertPanel.controls.itemById(cmdId)
+            if btnControl:
+                btnControl.deleteMe()
+            
+            cmdDef = _ui.commandDefinitions.itemById(cmdId)
+            if cmdDef:
+                cmdDef.deleteMe() 
     except:
         if _ui:
             _ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
\ No newline at end of file
@@ -0,0 +1,445 @@
+#Author-Hans Kellner
+#Description-Parser for the CSV point file format.  Doesn't depend on Fusion so it can also validate files from the command line.
+
+import argparse, math, sys
+from array import array
+
+try:
+    from . import patterns
+    from . import primitives
+except ImportError:
+    # Run as a script outside of Fusion
+    import patterns
+    import primitives
+
+# Number of errors kept with their line numbers.  Errors past this are only counted.
+DEFAULT_MAX_ERRORS = 50
+
+# First field of a line that holds a command rather than a point
+_COMMANDS = frozenset(['spiral', 'spiralcube', 'pipes', 'circle', 'arc', 'polygon'])
+
+# Number of lines between calls to the progress function
+_PROGRESS_INTERVAL = 1000
+
+# Which columns of a wide CSV file hold the X, Y, Z values, and optionally a column whose
+# value changing starts a new segment (e.g. a stroke id).  Each column is given by its
+# name in the header row or by its 1-based number.  Z is optional; if it's empty or not
+# in the header then Z is 0.
+class ColumnMapping:
+    def __init__(self, x = 'x', y = 'y', z = 'z', segmentBy = ''):
+        self.x = x
+        self.y = y
+        self.z = z
+        self.segmentBy = segmentBy
+
+    # True if X and Y are given by number, so a file without a header row can be mapped
+    def isByNumber(self):
+        return self.x.strip().isdigit() and self.y.strip().isdigit()
+
+    def asList(self):
+        return [self.x, self.y, self.z, self.segmentBy]
+
+    # Returns 0-based (xIndex, yIndex, zIndex, segmentIndex) with -1 for an unused column.
+    # Raises ValueError if a required column isn't found.
+    # @arg header : list of header names, or None if the file has no header row
+    def resolve(self, header):
+        names = [name.strip().lower() for name in header] if header != None else []
+
+        def find(column, isRequired):
+            column = column.strip()
+            if column.isdigit() and int(column) > 0:
+                return int(column) - 1
+            if column != '' and column.lower() in names:
+                return names.index(column.lower())
+            if isRequired:
+                raise ValueError("Column '{}' not found".format(column))
+            return -1
+
+        return (find(self.x, True), find(self.y, True), find(self.z, False), find(self.segmentBy, self.segmentBy.strip() != ''))
+
+# Returns the value of a command field.  Raises ValueError for text that isn't a number
+# and for inf, nan and values too large for a float, which Fusion can't use.  Point
+# values are checked the same way inline.
+def _toFloat(text):
+    value = float(text)
+    if not math.isfinite(value):
+        raise ValueError(text)
+    return value
+
+# Returns True if the fields look like a header row rather than values: a field is one
+# of the mapping's column names, or no field is a number.  A row of values with a typo
+# in it is not a header.
+def _isHeaderRow(pieces, columns):
+    names = set(name.strip().lower() for name in columns.asList() if name.strip() != '' and not name.strip().isdigit())
+    hasNumber = False
+    for piece in pieces:
+        piece = piece.strip()
+        if piece.lower() in names:
+            return True
+        if piece == '':
+            continue
+        try:
+            float(piece)
+            hasNumber = True
+        except ValueError:
+            pass
+    return not hasNumber
+
+# Points are kept in parallel typed arrays rather than one object per point.  Segments
+# (runs of points separated by blank lines or commands) are the ranges between
+# consecutive entries of segmentStarts.  Values are in the units of the CSV file
+# until scale() is called.
+class PointStore:
+    def __init__(self):
+        self.xs = array('d')
+        self.ys = array('d')
+        self.zs = array('d')
+        self.segmentStarts = array('q')
+        self._isSegmentOpen = False
+
+    def __len__(self):
+        return len(self.xs)
+
+    def append(self, x, y, z):
+        if not self._isSegmentOpen:
+            self.segmentStarts.append(len(self.xs))
+            self._isSegmentOpen = True
+        self.xs.append(x)
+        self.ys.append(y)
+        self.zs.append(z)
+
+    # End the current segment.  The next point starts a new one.
+    def endSegment(self):
+        self._isSegmentOpen = False
+
+    def segmentCount(self):
+        return len(self.segmentStarts)
+
+    # Returns (start, end) indices of segment i
+    def segmentRange(self, i):
+        end = self.segmentStarts[i + 1] if i + 1 < len(self.segmentStarts) else len(self.xs)
+        return (self.segmentStarts[i], end)
+
+    # Returns the number of points in each segment
+    def segmentLengths(self):
+        ends = list(self.segmentStarts[1:])
+        ends.append(len(self.xs))
+        return [end - start for (start, end) in zip(self.segmentStarts, ends)]
+
+    # Multiply all coordinates by factor, e.g. to convert from file units to 'cm'
+    def scale(self, factor):
+        if factor == 1:
+            return
+        mul = factor.__mul__
+        self.xs = array('d', map(mul, self.xs))
+        self.ys = array('d', map(mul, self.ys))
+        self.zs = array('d', map(mul, self.zs))
+
+    # Returns ((minX, minY, minZ), (maxX, maxY, maxZ)) or None if empty
+    def boundingBox(self):
+        if len(self.xs) == 0:
+            return None
+        return ((min(self.xs), min(self.ys), min(self.zs)), (max(self.xs), max(self.ys), max(self.zs)))
+
+# Everything read from a CSV file
+class ParseResult:
+    def __init__(self):
+        self.points = PointStore()
+        self.primitives = primitives.PrimitiveStore()
+        self.pipes = None               # (outerRadius, innerRadius) if the 'pipes' command was found
+        self.commandCounts = {}         # command name -> number of lines
+        self.errors = []                # (lineNumber, message), at most maxErrors entries
+        self.errorCount = 0
+        self.lineCount = 0
+        self.header = None              # Header row fields, if the file has one
+        self.columns = None             # Resolved (x, y, z, segment) column indices when columns are mapped
+        self.cancelled = False
+
+    def addError(self, lineNumber, message, maxErrors):
+        self.errorCount += 1
+        if len(self.errors) < maxErrors:
+            self.errors.append((lineNumber, message))
+
+# Parse a CSV point file.  All errors are collected (with 1-based line numbers) rather
+# than stopping at the first one.
+# @arg filename
+# @arg maxErrors : number of errors to keep with their line numbers
+# @arg onProgress : optional function called with the line number every few lines.  Return False to cancel.
+# @arg columns : ColumnMapping used when the file has a header row or the mapping is by column number.
+#                Otherwise each line holds X,Y[,Z].
+# Returns a ParseResult
+def parseFile(filename, maxErrors = DEFAULT_MAX_ERRORS, onProgress = None, columns = None):
+    with open(filename) as file:
+        return parseLines(file, maxErrors, onProgress, columns)
+
+# Parse lines of a CSV point file.  See parseFile().
+# @arg lines : iterable of lines, e.g. an open file
+# @arg header : header row fields if the lines come from the middle of a file with a header row
+def parseLines(lines, maxErrors = DEFAULT_MAX_ERRORS, onProgress = None, columns = None, header = None):
+
+    if columns == None:
+        columns = ColumnMapping()
+
+    result = ParseResult()
+    points = result.points
+    store = result.primitives
+    appendPoint = points.append
+    isfinite = math.isfinite
+    commandCounts = result.commandCounts
+
+    # Set once the first line with values has been checked for a header row
+    isFirstDataLine = True
+
+    # Mapped column indices.  Only the fields up to the last used column are split off
+    # each line; the rest of the line is left as one unconverted piece.
+    columnIndices = None
+    (xIndex, yIndex, zIndex, segmentIndex) = (-1, -1, -1, -1)
+    splitCount = 0
+    minFieldCount = 0
+    lastSegmentValue = None
+
+    if header != None:
+        isFirstDataLine = False
+        result.header = header
+        columnIndices = columns.resolve(header)
+        result.columns = columnIndices
+        (xIndex, yIndex, zIndex, segmentIndex) = columnIndices
+        minFieldCount = max(columnIndices) + 1
+        splitCount = minFieldCount
+
+    lineNumber = 0
+    for line in lines:
+
+        lineNumber += 1
+
+        if onProgress != None and lineNumber % _PROGRESS_INTERVAL == 0:
+            if not onProgress(lineNumber):
+                result.cancelled = True
+                break
+
+        line = line.strip()
+
+        # Is this line empty?  Note, also check for the case where the line contains the separators but no values.
+        # This can occur when some apps, such as Excel, exports empty rows.
+        if line == '' or (line[0] == ',' and line.strip(',') == ''):
+            # A blank line indicates a break in the point sequence and to start
+            # a new set of points.  For example, for creating multiple lines.
+            points.endSegment()
+            continue
+
+        if line[0] == '#':
+            continue    # Skip comment lines
+
+        # Header row, or mapping by column number?  Decided on the first line with values.
+        if isFirstDataLine:
+            isFirstDataLine = False
+            pieces = line.split(',')
+            isHeader = pieces[0] not in _COMMANDS and _isHeaderRow(pieces, columns)
+            if isHeader or columns.isByNumber():
+                if isHeader:
+                    result.header = [piece.strip() for piece in pieces]
+                try:
+                    columnIndices = columns.resolve(result.header)
+                except ValueError as err:
+                    result.addError(lineNumber, str(err), maxErrors)
+                    if isHeader:
+                        break   # The values can't be read without knowing their columns
+                    columnIndices = None    # Read the lines as X,Y[,Z]
+                if columnIndices != None:
+                    result.columns = columnIndices
+                    (xIndex, yIndex, zIndex, segmentIndex) = columnIndices
+                    minFieldCount = max(columnIndices) + 1
+                    splitCount = minFieldCount      # Fields past this stay in the last piece
+                if isHeader:
+                    continue
+
+        # Get the values from the csv file.
+        if columnIndices != None:
+            pieces = line.split(',', splitCount)
+        else:
+            pieces = line.split(',')
+
+        command = pieces[0]
+
+        try:
+            # A point from mapped columns
+            if columnIndices != None and command not in _COMMANDS:
+                if len(pieces) < minFieldCount:
+                    result.addError(lineNumber, "Expected at least {} columns".format(minFieldCount), maxErrors)
+                    continue
+
+                # A change in the segment column's value starts a new set of points.
+                # The value is only compared, never converted.
+                if segmentIndex >= 0:
+                    segmentValue = pieces[segmentIndex]
+                    if segmentValue != lastSegmentValue:
+                        points.endSegment()
+                        lastSegmentValue = segmentValue
+
+                (x, y, z) = (float(pieces[xIndex]), float(pieces[yIndex]), float(pieces[zIndex]) if zIndex >= 0 else 0.0)
+                if not (isfinite(x) and isfinite(y) and isfinite(z)):
+                    raise ValueError
+                appendPoint(x, y, z)
+                continue
+
+            # A point
+            if command not in _COMMANDS:
+                if (len(pieces) < 2 or len(pieces) > 3):
+                    result.addError(lineNumber, "No 2d or 3d point", maxErrors)
+                else:
+                    (x, y, z) = (float(pieces[0]), float(pieces[1]), float(pieces[2]) if len(pieces) == 3 else 0.0)
+                    if not (isfinite(x) and isfinite(y) and isfinite(z)):
+                        raise ValueError
+                    appendPoint(x, y, z)
+                continue
+
+            # Commands are always split into all of their fields
+            if columnIndices != None:
+                pieces = line.split(',')
+
+            # A command.  Commands end the current set of points.
+            commandCounts[command] = commandCounts.get(command, 0) + 1
+            points.endSegment()
+
+            if command == 'spiral':
+
+                # spiral needs 5 arguments: numArms, numPointsPerArm, armsOffset, rateExpansion, zStep
+                if len(pieces) != 6:
+                    result.addError(lineNumber, "Invalid 'spiral'", maxErrors)
+                    continue
+
+                linesPattern = patterns.generateSpiral(int(pieces[1]), int(pieces[2]), _toFloat(pieces[3]), _toFloat(pieces[4]), _toFloat(pieces[5]))
+
+            elif command == 'spiralcube':
+
+                # spiral cube needs 3 arguments: pointCount, rotationInRadians, lengthGrow
+                if len(pieces) != 4:
+                    result.addError(lineNumber, "Invalid 'spiralcube'", maxErrors)
+                    continue
+
+                linesPattern = patterns.generateSpiralCube(int(pieces[1]), _toFloat(pieces[2]), _toFloat(pieces[3]))
+
+            # Command to create pipes for all of the lines/splines read
+            # REVIEW: HACK: This is a hack to allow creating pipes.
+            elif command == 'pipes':
+
+                # pipe needs 1 or 2 arguments: outer radius, [inner radius]
+                if (len(pieces) < 2 or len(pieces) > 3):
+                    result.addError(lineNumber, "Invalid 'pipes'", maxErrors)
+                    continue
+
+                result.pipes = (_toFloat(pieces[1]), _toFloat(pieces[2]) if len(pieces) == 3 else 0)
+                continue
+
+            elif command == 'circle':
+
+                # circle needs 3 or 4 arguments: center point [x, y, z] and radius
+                if (len(pieces) < 4 or len(pieces) > 5):
+                    result.addError(lineNumber, "Invalid 'circle'", maxErrors)
+                elif (len(pieces) == 4):
+                    store.addCircle(_toFloat(pieces[1]), _toFloat(pieces[2]), 0, _toFloat(pieces[3]))
+                else:
+                    store.addCircle(_toFloat(pieces[1]), _toFloat(pieces[2]), _toFloat(pieces[3]), _toFloat(pieces[4]))
+                continue
+
+            elif command == 'arc':
+
+                # arc needs 5 or 6 arguments: center point [x, y, z], radius, start angle and sweep angle (degrees)
+                if (len(pieces) < 6 or len(pieces) > 7):
+                    result.addError(lineNumber, "Invalid 'arc'", maxErrors)
+                elif (len(pieces) == 6):
+                    store.addArc(_toFloat(pieces[1]), _toFloat(pieces[2]), 0, _toFloat(pieces[3]), _toFloat(pieces[4]), _toFloat(pieces[5]))
+                else:
+                    store.addArc(_toFloat(pieces[1]), _toFloat(pieces[2]), _toFloat(pieces[3]), _toFloat(pieces[4]), _toFloat(pieces[5]), _toFloat(pieces[6]))
+                continue
+
+            elif command == 'polygon':
+
+                # polygon needs 4 or 5 arguments: center point [x, y, z], radius and number of sides
+                if (len(pieces) < 5 or len(pieces) > 6):
+                    result.addError(lineNumber, "Invalid 'polygon'", maxErrors)
+                    continue
+
+                if (len(pieces) == 5):
+                    (x, y, z, radius, sides) = (_toFloat(pieces[1]), _toFloat(pieces[2]), 0, _toFloat(pieces[3]), int(pieces[4]))
+                else:
+                    (x, y, z, radius, sides) = (_toFloat(pieces[1]), _toFloat(pieces[2]), _toFloat(pieces[3]), _toFloat(pieces[4]), int(pieces[5]))
+
+                if sides < 3 or sides > primitives.MAX_POLYGON_SIDES:
+                    result.addError(lineNumber, "Invalid 'polygon' side count", maxErrors)
+                else:
+                    store.addPolygon(x, y, z, radius, sides)
+                continue
+
+            # Pattern commands
+            if linesPattern == None:
+                result.addError(lineNumber, "Invalid parameters for '{}'".format(command), maxErrors)
+                continue
+
+            for patternPoints in linesPattern:
+                for (x, y, z) in patternPoints:
+                    appendPoint(x, y, z)
+                points.endSegment()
+
+        except ValueError:
+            result.addError(lineNumber, "Invalid number", maxErrors)
+
+    result.lineCount = lineNumber
+    return result
+
+# Returns a multi-line summary of a ParseResult: counts, bounding box and errors
+def formatReport(result, filename):
+
+    report = ['CSV file: {}'.format(filename)]
+    report.append('Lines: {}'.format(result.lineCount))
+    report.append('Points: {}'.format(len(result.points)))
+    report.append('Segments: {}'.format(result.points.segmentCount()))
+    if result.columns != None:
+        names = result.header if result.header != None else []
+        def columnName(index):
+            if index < 0:
+                return '-'
+            return names[index] if index < len(names) else str(index + 1)
+        report.append('Columns: X={} Y={} Z={} Segment={}'.format(*[columnName(index) for index in result.columns]))
+    if len(result.primitives) > 0:
+        report.append('Circles: {}  Arcs: {}  Polygons: {}'.format(result.primitives.count(primitives.PRIMITIVE_CIRCLE),
+                                                                   result.primitives.count(primitives.PRIMITIVE_ARC),
+                                                                   result.primitives.count(primitives.PRIMITIVE_POLYGON)))
+    if len(result.commandCounts) > 0:
+        report.append('Commands: ' + ', '.join('{} x{}'.format(name, count) for (name, count) in sorted(result.commandCounts.items())))
+
+    boundingBox = result.points.boundingBox()
+    if boundingBox != None:
+        report.append('Bounding box (file units): ({:g}, {:g}, {:g}) to ({:g}, {:g}, {:g})'.format(*boundingBox[0], *boundingBox[1]))
+
+    if result.cancelled:
+        report.append('Cancelled before the end of the file')
+
+    if result.errorCount == 0:
+        report.append('No errors')
+    else:
+        report.append('Errors: {}'.format(result.errorCount))
+        for (lineNumber, message) in result.errors:
+            report.append('  line {}: {}'.format(lineNumber, message))
+        if result.errorCount > len(result.errors):
+            report.append('  ... and {} more'.format(result.errorCount - len(result.errors)))
+
+    return '\n'.join(report)
+
+# Command line: validate a CSV file and print a report.  Exits with 1 if there are errors.
+def main(argv = None):
+    parser = argparse.ArgumentParser(description='Validate a CSV points file without importing it.')
+    parser.add_argument('filename', help='CSV file to check')
+    parser.add_argument('--x', default='x', help='name or number of the X column when mapping columns (default x)')
+    parser.add_argument('--y', default='y', help='name or number of the Y column (default y)')
+    parser.add_argument('--z', default='z', help='name or number of the Z column (default z)')
+    parser.add_argument('--segment-by', default='', help='name or number of a column that starts a new segment when its value changes')
+    parser.add_argument('--max-errors', type=int, default=DEFAULT_MAX_ERRORS, help='number of errors to list (default {})'.format(DEFAULT_MAX_ERRORS))
+    args = parser.parse_args(argv)
+
+    result = parseFile(args.filename, args.max_errors, columns = ColumnMapping(args.x, args.y, args.z, args.segment_by))
+    print(formatReport(result, args.filename))
+    return 1 if result.errorCount > 0 else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,202 @@
+#Author-Hans Kellner
+#Description-Functions for exporting sketch geometry to a CSV file readable by the importer.
+
+import math
+
+from . import primitives
+
+# Size of the file write buffer
+_WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Number of points converted and formatted at once
+_WRITE_BATCH_POINTS = 65536
+
+# Precision used when writing values.  Enough to re-import to well below Fusion's tolerance.
+_VALUE_FORMAT = '{:.10g}'
+_ROW_FORMAT = _VALUE_FORMAT + ',' + _VALUE_FORMAT + ',' + _VALUE_FORMAT
+
+# Order line edges into connected chains.  A chain ends at any point that isn't shared by
+# exactly two edges, so a branch point is always the end of a chain.  The importer only
+# connects sets of points at their ends, so this is what lets it rebuild the same network.
+# @arg edges : list of (startKey, endKey, startXYZ, endXYZ) where keys identify shared endpoints
+# Returns a list of chains, each a list of XYZ tuples.  A closed loop repeats its first point at the end.
+def orderChains(edges):
+
+    adjacency = {}
+    keyPoints = {}
+    for i, (startKey, endKey, startXYZ, endXYZ) in enumerate(edges):
+        adjacency.setdefault(startKey, []).append(i)
+        adjacency.setdefault(endKey, []).append(i)
+        keyPoints[startKey] = startXYZ
+        keyPoints[endKey] = endXYZ
+
+    used = bytearray(len(edges))
+    chains = []
+
+    # Walk from the ends of open chains and from branch points first.  Whatever is left
+    # afterwards are closed loops.
+    startKeys = [key for key, edgeIndices in adjacency.items() if len(edgeIndices) != 2]
+    startKeys.extend(key for key, edgeIndices in adjacency.items() if len(edgeIndices) == 2)
+
+    for key in startKeys:
+        for iEdge in adjacency[key]:
+            if used[iEdge]:
+                continue
+
+            chain = [keyPoints[key]]
+            currentKey = key
+            nextEdge = iEdge
+            while nextEdge != None:
+                used[nextEdge] = 1
+                (startKey, endKey, startXYZ, endXYZ) = edges[nextEdge]
+                if startKey == currentKey:
+                    currentKey = endKey
+                    chain.append(endXYZ)
+                else:
+                    currentKey = startKey
+                    chain.append(startXYZ)
+
+                nextEdge = None
+                if len(adjacency[currentKey]) != 2:
+                    break
+                for iNext in adjacency[currentKey]:
+                    if not used[iNext]:
+                        nextEdge = iNext
+                        break
+
+            chains.append(chain)
+
+    return chains
+
+# Collect the geometry of a sketch in sketch space ('cm').
+# Returns a pair (segments: list of lists of XYZ tuples, primitiveStore: PrimitiveStore)
+# Segments are: connected line chains, fitted splines (their fit points), then isolated sketch points.
+def collectSketchGeometry(sketch, progressDialog = None):
+
+    sketchCurves = sketch.sketchCurves
+
+    # Lines, ordered by connected chain.  Lines that share a sketch point have exactly the same
+    # endpoint coordinates, so the coordinates are the key.  (Entity tokens can't be compared.)
+    edges = []
+    for line in sketchCurves.sketchLines:
+        startPt = line.startSketchPoint.geometry
+        endPt = line.endSketchPoint.geometry
+        startXYZ = (startPt.x, startPt.y, startPt.z)
+        endXYZ = (endPt.x, endPt.y, endPt.z)
+        edges.append((startXYZ, endXYZ, startXYZ, endXYZ))
+
+        if progressDialog != None and len(edges) % 1000 == 0:
+            if progressDialog.wasCancelled:
+                return ([], primitives.PrimitiveStore())
+            progressDialog.progressValue = len(edges)
+
+    segments = orderChains(edges)
+
+    # Fitted splines
+    for spline in sketchCurves.sketchFittedSplines:
+        splinePoints = []
+        for fitPoint in spline.fitPoints:
+            pt = fitPoint.geometry
+            splinePoints.append((pt.x, pt.y, pt.z))
+        if spline.isClosed and len(splinePoints) > 0:
+            splinePoints.append(splinePoints[0])
+        segments.append(splinePoints)
+
+    # Circles and arcs
+    primitiveStore = primitives.PrimitiveStore()
+    for circle in sketchCurves.sketchCircles:
+        center = circle.centerSketchPoint.geometry
+        primitiveStore.addCircle(center.x, center.y, center.z, circle.radius)
+
+    for arc in sketchCurves.sketchArcs:
+        center = arc.centerSketchPoint.geometry
+        startPt = arc.startSketchPoint.geometry
+        (retVal, arcCenter, normal, refVector, radius, startAngle, endAngle) = arc.geometry.getData()
+        sweepAngle = endAngle - startAngle
+        if normal.z < 0:
+            sweepAngle = -sweepAngle
+        startAngleDeg = math.degrees(math.atan2(startPt.y - center.y, startPt.x - center.x))
+        primitiveStore.addArc(center.x, center.y, center.z, arc.radius, startAngleDeg, math.degrees(sweepAngle))
+
+    # Points that aren't part of any curve.  Skip the sketch origin.
+    originPoint = sketch.originPoint
+    for sketchPoint in sketch.sketchPoints:
+        if sketchPoint.connectedEntities.count == 0 and sketchPoint != originPoint:
+            pt = sketchPoint.geometry
+            segments.append([(pt.x, pt.y, pt.z)])
+
+    return (segments, primitiveStore)
+
+# Write segments and primitives to a CSV file in the importer's format.
+# @arg filename
+# @arg segments : list of lists of XYZ tuples in 'cm'
+# @arg primitiveStore : PrimitiveStore in 'cm'
+# @arg unitScale : factor converting 'cm' to the output unit
+# @arg unitName : output unit, written to the header comment
+# Returns the number of rows written (points and primitive records)
+def writeCsv(filename, segments, primitiveStore, unitScale, unitName):
+
+    rowCount = 0
+    mul = float(unitScale).__mul__
+
+    with open(filename, 'w', buffering=_WRITE_BUFFER_SIZE) as file:
+        file.write('# Exported by Import CSV Points.  Units: {}\n'.format(unitName))
+
+        # Segments are gathered into batches of flat coordinates so the unit conversion and
+        # formatting of a whole batch run as a few bulk operations.
+        batchCoords = []
+        batchSegmentLengths = []
+
+        def flush():
+            scaled = list(map(mul, batchCoords))
+            rows = []
+            iCoord = 0
+            for segmentLength in batchSegmentLengths:
+                rows.append('\n')
+                for iPt in range(segmentLength):
+                    rows.append(_ROW_FORMAT.format(scaled[iCoord], scaled[iCoord + 1], scaled[iCoord + 2]))
+                    rows.append('\n')
+                    iCoord += 3
+            file.write(''.join(rows))
+            batchCoords.clear()
+            batchSegmentLengths.clear()
+
+        for segment in segments:
+            if len(segment) == 0:
+                continue
+            for pt in segment:
+                batchCoords.extend(pt)
+            batchSegmentLengths.append(len(segment))
+            rowCount += len(segment)
+
+            if len(batchCoords) >= _WRITE_BATCH_POINTS * 3:
+                flush()
+
+        if len(batchSegmentLengths) > 0:
+            flush()
+
+        # Primitive records.  Lengths are converted as they're written; the caller's store is left in 'cm'.
+        if len(primitiveStore) > 0:
+            rows = ['\n']
+            for i in range(len(primitiveStore)):
+                kind = primitiveStore.kinds[i]
+                values = [primitiveStore.xs[i] * unitScale, primitiveStore.ys[i] * unitScale, primitiveStore.zs[i] * unitScale, primitiveStore.radii[i] * unitScale]
+                if kind == primitives.PRIMITIVE_CIRCLE:
+                    rows.append('circle')
+                elif kind == primitives.PRIMITIVE_ARC:
+                    rows.append('arc')
+                    values.append(math.degrees(primitiveStore.startAngles[i]))
+                    values.append(math.degrees(primitiveStore.sweepAngles[i]))
+                else:
+                    rows.append('polygon')
+                for value in values:
+                    rows.append(',')
+                    rows.append(_VALUE_FORMAT.format(value))
+                if kind == primitives.PRIMITIVE_POLYGON:
+                    rows.append(',{}'.format(primitiveStore.sides[i]))
+                rows.append('\n')
+            file.write(''.join(rows))
+
+            rowCount += len(primitiveStore)
+
+    return rowCount
@@ -0,0 +1,138 @@
+#Author-Hans Kellner
+#Description-Checkpoint journal that lets a long import be resumed after a cancel or crash.
+
+import hashlib, json, os, time
+
+# Journal file written next to the CSV file
+JOURNAL_SUFFIX = '.import-journal.json'
+
+_JOURNAL_VERSION = 1
+
+# Minimum time between checkpoint writes
+_CHECKPOINT_INTERVAL_SECONDS = 2.0
+
+# Import phases recorded in the journal, in the order they run
+PHASE_SKETCH = 'sketch'
+PHASE_PRIMITIVES = 'primitives'
+PHASE_PIPES = 'pipes'
+PHASE_BODIES = 'bodies'
+PHASE_ORDER = [PHASE_SKETCH, PHASE_PRIMITIVES, PHASE_PIPES, PHASE_BODIES]
+
+# Returns the SHA-1 hex digest of a file's contents
+def fileHash(filename):
+    sha = hashlib.sha1()
+    with open(filename, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+# Journal for one CSV file.  It records the file hash and the import options so a
+# checkpoint is only offered for the same file imported the same way, plus the phase
+# and index of the last completed unit of work (segment, primitive, pipe or body) and
+# any names needed to find the entities created so far.
+#
+# Journaling is best effort: if the journal can't be written (e.g. the CSV file is in a
+# read-only folder) it is turned off and the import carries on without it.
+class ImportJournal:
+    def __init__(self, csvFilename, options):
+        self.csvFilename = csvFilename
+        self.filename = csvFilename + JOURNAL_SUFFIX
+        self.options = options
+        self.phase = None
+        self.index = 0
+        self.names = {}
+        self.isEnabled = True
+        self._hash = None
+        self._lastSave = 0
+
+    # The CSV file hash is only needed once a journal is read or written, so it's computed
+    # on first use rather than for every import.
+    def _getHash(self):
+        if self._hash == None:
+            self._hash = fileHash(self.csvFilename)
+        return self._hash
+
+    # Load an existing checkpoint for this file and options.
+    # Returns True if one was found; phase, index and names are then set from it.
+    def load(self):
+        try:
+            with open(self.filename, 'r') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return False
+
+        if data.get('version') != _JOURNAL_VERSION or data.get('options') != self.options:
+            return False
+
+        try:
+            if data.get('hash') != self._getHash():
+                return False
+        except OSError:
+            return False
+
+        self.phase = data.get('phase')
+        self.index = data.get('index', 0)
+        self.names = data.get('names', {})
+        return True
+
+    # Forget the loaded checkpoint and start from the beginning
+    def reset(self):
+        self.phase = None
+        self.index = 0
+        self.names = {}
+
+    # Record that work up to index (exclusive) of phase is complete.  Writes are
+    # throttled unless force is True.
+    def checkpoint(self, phase, index, force = False):
+        self.phase = phase
+        self.index = index
+
+        if not self.isEnabled:
+            return
+
+        now = time.monotonic()
+        if not force and now - self._lastSave < _CHECKPOINT_INTERVAL_SECONDS:
+            return
+        self._lastSave = now
+
+        # Write to a temporary file first so a crash never leaves a partial journal
+        tmpFilename = self.filename + '.tmp'
+        try:
+            data = {
+                'version': _JOURNAL_VERSION,
+                'hash': self._getHash(),
+                'options': self.options,
+                'phase': self.phase,
+                'index': self.index,
+                'names': self.names
+            }
+            with open(tmpFilename, 'w') as file:
+                json.dump(data, file)
+            os.replace(tmpFilename, self.filename)
+        except OSError:
+            # Can't write next to the CSV file.  Carry on without a journal.
+            self.isEnabled = False
+
+    # Write the current checkpoint now, e.g. when the import is cancelled
+    def flush(self):
+        if self.phase != None:
+            self.checkpoint(self.phase, self.index, True)
+
+    # Returns True if the checkpoint is past the given phase
+    def isPhaseComplete(self, phase):
+        return self.phase != None and PHASE_ORDER.index(self.phase) > PHASE_ORDER.index(phase)
+
+    # Returns the index to resume the given phase from
+    def startIndex(self, phase):
+        return self.index if self.phase == phase else 0
+
+    # Remove the journal once the import has finished
+    def clear(self):
+        self.phase = None
+        self.index = 0
+        try:
+            os.remove(self.filename)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            self.isEnabled = False
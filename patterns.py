@@ -1,7 +1,10 @@
 #Author-Hans Kellner
 #Description-Functions for generating patterns.
 
-import adsk.core, adsk.fusion, traceback, math, random
+import math, random
+
+# Points are returned as (x, y, z) tuples so the patterns can be generated without Fusion
+# (e.g. when validating a file from the command line).
 
 # Generate a sprial cube
 # @arg countPoints = 20
@@ -12,21 +15,23 @@ def generateSpiralCube(countPoints, angleDeg, lengthGrow):
     lineLength = 1
     points = []
 
-    dirVec = adsk.core.Vector3D.create(1,0,0)
-    ptLast = adsk.core.Point3D.create(0,0,0)
+    dirX = 1.0
+    dirY = 0.0
+    ptLast = (0, 0, 0)
     points.append(ptLast)
 
-    mat = adsk.core.Matrix3D.create()
+    cosAngle = math.cos(angleDeg/180*math.pi)
+    sinAngle = math.sin(angleDeg/180*math.pi)
 
     for i in range(countPoints - 1):
-        
-        ptNext = adsk.core.Point3D.create(ptLast.x + (lineLength * dirVec.x), ptLast.y + (lineLength * dirVec.y), 0)
+
+        ptNext = (ptLast[0] + (lineLength * dirX), ptLast[1] + (lineLength * dirY), 0)
         points.append(ptNext)
 
         ptLast = ptNext
 
-        mat.setToRotation(angleDeg/180*math.pi, adsk.core.Vector3D.create(0,0,1), adsk.core.Point3D.create(0,0,0))
-        dirVec.transformBy(mat)
+        # Rotate the direction about Z
+        (dirX, dirY) = (dirX * cosAngle - dirY * sinAngle, dirX * sinAngle + dirY * cosAngle)
 
         lineLength = lineLength + lengthGrow
 
@@ -52,10 +57,9 @@ def generateSpiral(numArms = 10, numPointsPerArm = 20, armsOffset = 3, rateExpan
             if zStep != 0:
                 pZ += zStep * random.random()
 
-            pt3D = adsk.core.Point3D.create(pX, pY, pZ)
-            points.append(pt3D)
+            points.append((pX, pY, pZ))
 
         lines.append(points)
-    
+
     return lines
 
@@ -5,18 +5,30 @@ import adsk.core, adsk.fusion, traceback, math, random
 
 # Generate pipes that follow each specified sketch line
 # @arg rootComp
-# @arg sketchLines
+# @arg sketchLines : Sketch curves (the path is the curve's chain) or ObjectCollections of curves (the path is exactly those curves)
 # @arg outerRadius
 # @arg innerRadius
+# @arg startIndex : Index of the first sketch line to create a pipe for (earlier ones were done by a previous run)
+# @arg onPipeCreated : Optional function called with the count of completed sketch lines after each pipe that was created
+# @arg progressDialog : Optional progress dialog that is updated and checked for cancel before each pipe
+# Returns False if cancelled before all of the pipes were created
 
-def createPipesOnLines(app, ui, sketchLines, outerDiam, innerDiam):
+def createPipesOnLines(app, ui, sketchLines, outerDiam, innerDiam, startIndex = 0, onPipeCreated = None, progressDialog = None):
 
         design = app.activeProduct
         rootComp = design.rootComponent
         sketches = rootComp.sketches
         feats = rootComp.features
 
-        for line in sketchLines:
+        for iLine in range(startIndex, len(sketchLines)):
+
+            if progressDialog != None:
+                # If progress dialog is cancelled, stop creating pipes.
+                if progressDialog.wasCancelled:
+                    return False
+                progressDialog.progressValue = iLine
+
+            line = sketchLines[iLine]
 
             try:
 
@@ -42,8 +54,9 @@ def createPipesOnLines(app, ui, sketchLines, outerDiam, innerDiam):
 
                 else:
 
-                    # create path
-                    path = feats.createPath(line, True)
+                    # create path.  A collection is used as is so connected segments don't chain into each other.
+                    isChain = (line.objectType != adsk.core.ObjectCollection.classType())
+                    path = feats.createPath(line, isChain)
 
                     # create profile
                     planes = rootComp.constructionPlanes
@@ -53,6 +66,9 @@ def createPipesOnLines(app, ui, sketchLines, outerDiam, innerDiam):
 
                     sketch = sketches.add(plane)
 
+                    # Defer the sketch solve until both circles are in so profiles are only computed once
+                    sketch.isComputeDeferred = True
+
                     center = sketch.modelToSketchSpace(plane.geometry.origin)
 
                     circleOuter = sketch.sketchCurves.sketchCircles.addByCenterRadius(center, outerDiam)
@@ -60,13 +76,45 @@ def createPipesOnLines(app, ui, sketchLines, outerDiam, innerDiam):
                     if innerDiam > 0:
                         circleInner = sketch.sketchCurves.sketchCircles.addByCenterRadius(center, innerDiam)
 
+                    sketch.isComputeDeferred = False
+
                     profileOuter = sketch.profiles[0]
 
-                    # create sweep for outer
+                    # create sweep for outer.  Each pipe is a new body; joining every pipe into one
+                    # growing body made each sweep slower than the last.  See combinePipeBodies().
                     sweepFeats = feats.sweepFeatures
-                    sweepInputOuter = sweepFeats.createInput(profileOuter, path, adsk.fusion.FeatureOperations.JoinFeatureOperation)
+                    sweepInputOuter = sweepFeats.createInput(profileOuter, path, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
                     sweepInputOuter.orientation = adsk.fusion.SweepOrientationTypes.PerpendicularOrientationType
                     sweepFeat = sweepFeats.add(sweepInputOuter)
 
+                    if onPipeCreated != None:
+                        onPipeCreated(iLine + 1)
+
             except:
                 print("Unexpected error")
+
+        return True
+
+# Join the pipe bodies into one body with a single combine feature
+# @arg firstBodyIndex : Index in the root component's bodies of the first pipe body
+def combinePipeBodies(app, firstBodyIndex):
+
+        design = app.activeProduct
+        rootComp = design.rootComponent
+        bodies = rootComp.bRepBodies
+
+        if bodies.count - firstBodyIndex < 2:
+            return
+
+        toolBodies = adsk.core.ObjectCollection.create()
+        for iBody in range(firstBodyIndex + 1, bodies.count):
+            toolBodies.add(bodies.item(iBody))
+
+        try:
+            combineFeats = rootComp.features.combineFeatures
+            combineInput = combineFeats.createInput(bodies.item(firstBodyIndex), toolBodies)
+            combineInput.operation = adsk.fusion.FeatureOperations.JoinFeatureOperation
+            combineFeats.add(combineInput)
+        except:
+            # Leave the pipes as separate bodies
+            print("Unexpected error")
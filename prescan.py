@@ -0,0 +1,237 @@
+#Author-Hans Kellner
+#Description-Quick statistics for a CSV point file, shown in the dialog before importing.
+
+import io, mmap, os, time
+
+try:
+    from . import csvparser
+except ImportError:
+    # Run as a script outside of Fusion
+    import csvparser
+
+# Files up to this size are parsed completely, which gives exact statistics
+FULL_PARSE_MAX_BYTES = 4 * 1024 * 1024
+
+# Larger files are sampled: this many windows of this size spread evenly over the file
+_SAMPLE_COUNT = 32
+_SAMPLE_BYTES = 64 * 1024
+
+# Rough time in seconds Fusion takes to create one entity of each kind.  Used only to
+# give an idea of how long an import will take.
+_SECONDS_PER_SKETCH_POINT = 0.003
+_SECONDS_PER_SKETCH_LINE = 0.007
+_SECONDS_PER_SPLINE = 0.05
+_SECONDS_PER_SPLINE_POINT = 0.001
+_SECONDS_PER_PRIMITIVE = 0.005
+_SECONDS_PER_BODY = 0.25
+_SECONDS_PER_PIPE = 0.5
+
+# Segment length histogram bucket upper bounds (inclusive); the last bucket is open ended
+_HISTOGRAM_BOUNDS = [1, 9, 99, 999]
+
+# Commands counted over the whole file
+_COMMAND_NAMES = ['spiral', 'spiralcube', 'pipes', 'circle', 'arc', 'polygon']
+
+# Size of the blocks the file is counted in
+_SCAN_BLOCK_BYTES = 16 * 1024 * 1024
+
+class ScanStats:
+    def __init__(self):
+        self.isSampled = False
+        self.fileSize = 0
+        self.rowCount = 0
+        self.pointCount = 0
+        self.segmentCount = 0
+        self.primitiveCount = 0
+        self.commandCounts = {}
+        self.segmentHistogram = [0] * (len(_HISTOGRAM_BOUNDS) + 1)
+        self.boundingBox = None
+        self.hasPipes = False
+        self.header = None
+        self.columns = None     # Resolved column indices, see csvparser.ParseResult
+        self.errorCount = 0
+        self.scanSeconds = 0
+
+    # Returns the estimated (entityCount, seconds) to import with each style, as a list
+    # of (styleName, entityCount, seconds)
+    def projections(self):
+        pipeSeconds = self.segmentCount * _SECONDS_PER_PIPE if self.hasPipes else 0
+        primitiveSeconds = self.primitiveCount * _SECONDS_PER_PRIMITIVE
+        lineCount = max(0, self.pointCount - self.segmentCount)
+        return [
+            ('Points', self.pointCount + self.primitiveCount, self.pointCount * _SECONDS_PER_SKETCH_POINT + primitiveSeconds),
+            ('Lines', lineCount + self.primitiveCount, lineCount * _SECONDS_PER_SKETCH_LINE + primitiveSeconds + pipeSeconds),
+            ('Fitted Splines', self.segmentCount + self.primitiveCount, self.segmentCount * _SECONDS_PER_SPLINE + self.pointCount * _SECONDS_PER_SPLINE_POINT + primitiveSeconds + pipeSeconds),
+            ('Solid Body', self.pointCount, self.pointCount * _SECONDS_PER_BODY)
+        ]
+
+def _addSegmentLengths(stats, lengths):
+    for length in lengths:
+        for (iBucket, bound) in enumerate(_HISTOGRAM_BOUNDS):
+            if length <= bound:
+                stats.segmentHistogram[iBucket] += 1
+                break
+        else:
+            stats.segmentHistogram[-1] += 1
+
+def _mergeBoundingBox(box, other):
+    if other == None:
+        return box
+    if box == None:
+        return other
+    return (tuple(map(min, box[0], other[0])), tuple(map(max, box[1], other[1])))
+
+# Scan a CSV point file.  Small files are parsed completely; larger ones are memory mapped,
+# the rows and commands are counted over the whole file, and the point values and segment
+# breaks are read from evenly spaced samples.
+# @arg columns : csvparser.ColumnMapping
+# Returns a ScanStats
+def scanFile(filename, columns = None):
+
+    startTime = time.monotonic()
+    stats = ScanStats()
+    stats.fileSize = os.path.getsize(filename)
+
+    if stats.fileSize <= FULL_PARSE_MAX_BYTES:
+        result = csvparser.parseFile(filename, columns = columns)
+        stats.rowCount = result.lineCount
+        stats.pointCount = len(result.points)
+        stats.segmentCount = result.points.segmentCount()
+        stats.primitiveCount = len(result.primitives)
+        stats.commandCounts = result.commandCounts
+        stats.boundingBox = result.points.boundingBox()
+        stats.hasPipes = (result.pipes != None)
+        stats.header = result.header
+        stats.columns = result.columns
+        stats.errorCount = result.errorCount
+        _addSegmentLengths(stats, result.points.segmentLengths())
+        stats.scanSeconds = time.monotonic() - startTime
+        return stats
+
+    stats.isSampled = True
+
+    with open(filename, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+
+        # Rows and commands are counted a block at a time with bytes.count(), which runs at
+        # memory speed.  Matches split across two blocks are missed, which doesn't matter for
+        # an estimate.
+        commandPatterns = [(name, b'\n' + name.encode('ascii') + b',') for name in _COMMAND_NAMES]
+        for position in range(0, stats.fileSize, _SCAN_BLOCK_BYTES):
+            block = mm[position:position + _SCAN_BLOCK_BYTES]
+            stats.rowCount += block.count(b'\n')
+            for (name, pattern) in commandPatterns:
+                count = block.count(pattern)
+                if count > 0:
+                    stats.commandCounts[name] = stats.commandCounts.get(name, 0) + count
+
+        if mm[stats.fileSize - 1:stats.fileSize] != b'\n':
+            stats.rowCount += 1
+
+        # A command on the first line
+        for (name, pattern) in commandPatterns:
+            if mm[:len(pattern) - 1] == pattern[1:]:
+                stats.commandCounts[name] = stats.commandCounts.get(name, 0) + 1
+
+        stats.hasPipes = ('pipes' in stats.commandCounts)
+        stats.primitiveCount = sum(stats.commandCounts.get(name, 0) for name in ('circle', 'arc', 'polygon'))
+
+        # Sample point values.  Each window is cut back to whole lines.
+        sampledLines = 0
+        sampledPoints = 0
+        sampledBreaks = 0
+        header = None
+        sampleStride = (stats.fileSize - _SAMPLE_BYTES) // (_SAMPLE_COUNT - 1)
+        for iSample in range(_SAMPLE_COUNT):
+            start = iSample * sampleStride
+            window = mm[start:start + _SAMPLE_BYTES]
+            if start > 0:
+                window = window[window.find(b'\n') + 1:]
+            window = window[:window.rfind(b'\n') + 1]
+
+            sampleLines = io.StringIO(window.decode('utf-8', 'replace'))
+            result = csvparser.parseLines(sampleLines, columns = columns, header = header)
+            if iSample == 0:
+                header = result.header
+                stats.header = header
+                stats.columns = result.columns
+
+                # The column mapping doesn't match the header.  The error is in errorCount.
+                if header != None and result.columns == None:
+                    stats.errorCount = result.errorCount
+                    break
+
+            sampledLines += result.lineCount
+            sampledPoints += len(result.points)
+            # Segment breaks (blank or separator-only rows, commands, segment column changes)
+            # inside the window.  The window's first segment continues from the one before it.
+            sampledBreaks += max(0, result.points.segmentCount() - 1)
+            stats.errorCount += result.errorCount
+            stats.boundingBox = _mergeBoundingBox(stats.boundingBox, result.points.boundingBox())
+
+            # The first and last segments of a window are usually cut off
+            _addSegmentLengths(stats, result.points.segmentLengths()[1:-1])
+
+    # Extrapolate from the samples
+    if sampledLines > 0:
+        stats.pointCount = int(stats.rowCount * sampledPoints / sampledLines)
+        stats.segmentCount = min(stats.pointCount, int(stats.rowCount * sampledBreaks / sampledLines) + 1)
+
+        # The histogram holds the sampled segments.  Spread the estimated segment count over
+        # its buckets in the same proportions so the two agree.
+        sampledHistogramTotal = sum(stats.segmentHistogram)
+        if sampledHistogramTotal > 0:
+            stats.segmentHistogram = [int(round(stats.segmentCount * count / sampledHistogramTotal)) for count in stats.segmentHistogram]
+        stats.errorCount = int(stats.rowCount * stats.errorCount / sampledLines)
+
+    stats.scanSeconds = time.monotonic() - startTime
+    return stats
+
+# Returns the column indices the mapping gives for the scanned file, to compare with
+# stats.columns and only rescan when they differ.  Raises ValueError if a column isn't
+# found.
+def resolveColumns(stats, columns):
+    if stats.header == None and not columns.isByNumber():
+        return None
+    return columns.resolve(stats.header)
+
+def _formatSeconds(seconds):
+    if seconds < 60:
+        return '{:.0f} s'.format(seconds)
+    if seconds < 3600:
+        return '{:.0f} min'.format(seconds / 60)
+    return '{:.1f} h'.format(seconds / 3600)
+
+# Returns the statistics as a list of text lines
+# @arg unitName : unit the file values are in, shown with the bounding box size
+def formatStats(stats, unitName):
+
+    approx = '~' if stats.isSampled else ''
+    report = []
+    report.append('Rows: {}  Points: {}{}  Segments: {}{}'.format(stats.rowCount, approx, stats.pointCount, approx, stats.segmentCount))
+
+    if stats.header != None:
+        report.append('Header: {}'.format(', '.join(stats.header)))
+
+    if len(stats.commandCounts) > 0:
+        report.append('Commands: ' + ', '.join('{} x{}'.format(name, count) for (name, count) in sorted(stats.commandCounts.items())))
+
+    if stats.boundingBox != None:
+        (low, high) = stats.boundingBox
+        report.append('Bounds{}: ({:g}, {:g}, {:g}) to ({:g}, {:g}, {:g})'.format(' (sampled)' if stats.isSampled else '', *low, *high))
+        report.append('Size: {:g} x {:g} x {:g} {}'.format(high[0] - low[0], high[1] - low[1], high[2] - low[2], unitName))
+
+    labels = ['1']
+    for (iBound, bound) in enumerate(_HISTOGRAM_BOUNDS[1:]):
+        labels.append('{}-{}'.format(_HISTOGRAM_BOUNDS[iBound] + 1, bound))
+    labels.append('{}+'.format(_HISTOGRAM_BOUNDS[-1] + 1))
+    report.append('Segment lengths{}: '.format(' (estimated from samples)' if stats.isSampled else '') +
+                  ', '.join('{}: {}'.format(label, count) for (label, count) in zip(labels, stats.segmentHistogram) if count > 0))
+
+    for (styleName, entityCount, seconds) in stats.projections():
+        report.append('{}: {}{} entities, about {}'.format(styleName, approx, entityCount, _formatSeconds(seconds)))
+
+    if stats.errorCount > 0:
+        report.append('Errors: {}{} (use Validate Only to list them)'.format(approx, stats.errorCount))
+
+    report.append('Scanned in {:.2f} s'.format(stats.scanSeconds))
+    return report
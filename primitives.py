@@ -0,0 +1,113 @@
+#Author-Hans Kellner
+#Description-Columnar storage for primitive records (circles, arcs, polygons) read from a CSV file.
+
+import math
+from array import array
+
+# Primitive kinds stored in PrimitiveStore.kinds
+PRIMITIVE_CIRCLE = 0
+PRIMITIVE_ARC = 1
+PRIMITIVE_POLYGON = 2
+
+# Coordinates closer than this (in cm) are treated as coincident when removing duplicates
+DEFAULT_DUPLICATE_TOLERANCE = 1.0e-6
+
+# Largest polygon side count.  Each side is a sketch line.
+MAX_POLYGON_SIDES = 1000
+
+# Primitives are kept in parallel typed arrays (one column per attribute) rather than
+# one object per record.  This keeps memory small for files with 100k+ records and lets
+# unit conversion run over a whole column at once.
+#
+# Columns:
+#   kinds        : PRIMITIVE_* value
+#   xs, ys, zs   : center point
+#   radii        : circle/arc radius, polygon circumscribed radius
+#   startAngles  : arc start angle or polygon rotation in radians (0 for circles)
+#   sweepAngles  : arc sweep angle in radians (0 for other kinds)
+#   sides        : polygon side count (0 for other kinds)
+class PrimitiveStore:
+    def __init__(self):
+        self.kinds = array('B')
+        self.xs = array('d')
+        self.ys = array('d')
+        self.zs = array('d')
+        self.radii = array('d')
+        self.startAngles = array('d')
+        self.sweepAngles = array('d')
+        self.sides = array('H')
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def _add(self, kind, x, y, z, radius, startAngle, sweepAngle, sides):
+        self.kinds.append(kind)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.zs.append(z)
+        self.radii.append(radius)
+        self.startAngles.append(startAngle)
+        self.sweepAngles.append(sweepAngle)
+        self.sides.append(sides)
+
+    def addCircle(self, x, y, z, radius):
+        self._add(PRIMITIVE_CIRCLE, x, y, z, radius, 0, 0, 0)
+
+    # Angles are in degrees, as written in the CSV file
+    def addArc(self, x, y, z, radius, startAngleDeg, sweepAngleDeg):
+        self._add(PRIMITIVE_ARC, x, y, z, radius, math.radians(startAngleDeg), math.radians(sweepAngleDeg), 0)
+
+    def addPolygon(self, x, y, z, radius, sides):
+        self._add(PRIMITIVE_POLYGON, x, y, z, radius, 0, 0, sides)
+
+    # Returns the number of primitives of the given kind
+    def count(self, kind):
+        return self.kinds.count(kind)
+
+    # Returns the indices of all primitives of the given kind, in file order
+    def indicesOf(self, kind):
+        return [i for i, k in enumerate(self.kinds) if k == kind]
+
+    # Multiply all length columns by factor.  Used to convert the whole store from
+    # the CSV file units to 'cm' in one pass.
+    def scale(self, factor):
+        if factor == 1:
+            return
+        mul = factor.__mul__
+        self.xs = array('d', map(mul, self.xs))
+        self.ys = array('d', map(mul, self.ys))
+        self.zs = array('d', map(mul, self.zs))
+        self.radii = array('d', map(mul, self.radii))
+
+    # Remove primitives that coincide with an earlier one (same kind, center, radius,
+    # angles and side count within tolerance).  The first occurrence is kept.
+    # Returns the number of primitives removed.
+    def removeDuplicates(self, tolerance = DEFAULT_DUPLICATE_TOLERANCE):
+        inv = 1.0 / tolerance
+
+        # Values too large to round (or inf/nan) are compared as they are
+        def quantize(v):
+            v *= inv
+            return round(v) if math.isfinite(v) else v
+
+        seen = set()
+        keep = []
+        for i, key in enumerate(zip(self.kinds,
+                                    map(quantize, self.xs),
+                                    map(quantize, self.ys),
+                                    map(quantize, self.zs),
+                                    map(quantize, self.radii),
+                                    map(quantize, self.startAngles),
+                                    map(quantize, self.sweepAngles),
+                                    self.sides)):
+            if key not in seen:
+                seen.add(key)
+                keep.append(i)
+
+        removed = len(self.kinds) - len(keep)
+        if removed > 0:
+            for name in ('kinds', 'xs', 'ys', 'zs', 'radii', 'startAngles', 'sweepAngles', 'sides'):
+                column = getattr(self, name)
+                setattr(self, name, array(column.typecode, [column[i] for i in keep]))
+
+        return removed
@@ -0,0 +1,73 @@
+#Author-Hans Kellner
+#Description-Affine transform stage applied to all imported coordinates at once.
+
+import math
+from array import array
+
+# Transforms are 3x4 affine matrices stored row-major as a flat list of 12 values:
+#   [ m00, m01, m02, tx,
+#     m10, m11, m12, ty,
+#     m20, m21, m22, tz ]
+IDENTITY = [1.0, 0.0, 0.0, 0.0,
+            0.0, 1.0, 0.0, 0.0,
+            0.0, 0.0, 1.0, 0.0]
+
+# Returns a transform that scales uniformly, then rotates about X, then Y, then Z
+# (angles in radians), then translates.
+def createTransform(scale = 1.0, rotX = 0.0, rotY = 0.0, rotZ = 0.0, tx = 0.0, ty = 0.0, tz = 0.0):
+    (cx, sx) = (math.cos(rotX), math.sin(rotX))
+    (cy, sy) = (math.cos(rotY), math.sin(rotY))
+    (cz, sz) = (math.cos(rotZ), math.sin(rotZ))
+
+    # Rz * Ry * Rx
+    return [scale * (cz * cy), scale * (cz * sy * sx - sz * cx), scale * (cz * sy * cx + sz * sx), tx,
+            scale * (sz * cy), scale * (sz * sy * sx + cz * cx), scale * (sz * sy * cx - cz * sx), ty,
+            scale * (-sy),     scale * (cy * sx),                scale * (cy * cx),                tz]
+
+# Returns a transform from the 16 values of a row-major 4x4 matrix (e.g. Matrix3D.asArray())
+def fromMatrix4(values):
+    return list(values[:12])
+
+def isIdentity(m):
+    return all(abs(v - i) < 1.0e-12 for (v, i) in zip(m, IDENTITY))
+
+# Returns the factor the transform scales lengths by (assumes a uniform scale)
+def lengthScale(m):
+    return math.sqrt(m[0] * m[0] + m[4] * m[4] + m[8] * m[8])
+
+# Returns the coordinate columns transformed by m, as new arrays
+def transformColumns(m, xs, ys, zs):
+    (m00, m01, m02, tx, m10, m11, m12, ty, m20, m21, m22, tz) = m
+    points = list(zip(xs, ys, zs))
+    return (array('d', [m00 * x + m01 * y + m02 * z + tx for (x, y, z) in points]),
+            array('d', [m10 * x + m11 * y + m12 * z + ty for (x, y, z) in points]),
+            array('d', [m20 * x + m21 * y + m22 * z + tz for (x, y, z) in points]))
+
+# Apply m to all points of a PointStore, in place
+def transformPointStore(m, pointStore):
+    if isIdentity(m):
+        return
+    (pointStore.xs, pointStore.ys, pointStore.zs) = transformColumns(m, pointStore.xs, pointStore.ys, pointStore.zs)
+
+# Apply m to a PrimitiveStore, in place.  Centers are transformed, radii are scaled and
+# angles follow the transform's rotation in the sketch XY plane.  If the transform mirrors
+# that plane (e.g. a 180 degree rotation about X or Y) the angles are mirrored too and arcs
+# sweep the other way.  Circles, arcs and polygons stay parallel to the sketch XY plane, so
+# only transforms that keep that plane parallel (any rotation about Z, 180 degree rotations
+# about X or Y, any scale) give exact results.
+def transformPrimitiveStore(m, primitiveStore):
+    if isIdentity(m) or len(primitiveStore) == 0:
+        return
+
+    (primitiveStore.xs, primitiveStore.ys, primitiveStore.zs) = transformColumns(m, primitiveStore.xs, primitiveStore.ys, primitiveStore.zs)
+    primitiveStore.radii = array('d', map(lengthScale(m).__mul__, primitiveStore.radii))
+
+    # Direction the X axis is turned to in the XY plane
+    angleZ = math.atan2(m[4], m[0])
+
+    if m[0] * m[5] - m[1] * m[4] < 0:
+        # Mirrored: an angle a becomes angleZ - a
+        primitiveStore.startAngles = array('d', [angleZ - angle for angle in primitiveStore.startAngles])
+        primitiveStore.sweepAngles = array('d', map((-1.0).__mul__, primitiveStore.sweepAngles))
+    elif angleZ != 0:
+        primitiveStore.startAngles = array('d', map(angleZ.__add__, primitiveStore.startAngles))
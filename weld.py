@@ -0,0 +1,56 @@
+#Author-Hans Kellner
+#Description-Spatial hash used to weld coincident segment endpoints into shared sketch points.
+
+import math
+
+# Endpoints closer than this (in cm) are welded into one sketch point
+DEFAULT_WELD_TOLERANCE = 1.0e-4
+
+# Offsets of a grid cell and its 26 neighbours
+_NEIGHBOUR_OFFSETS = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)]
+
+# Spatial hash over segment endpoints.  Space is divided into cubic cells the size of
+# the weld tolerance so a lookup only has to test the points stored in the 27 cells
+# around the query location, independent of how many endpoints have been added.
+#
+# The stored item is whatever the caller wants to share between segments; the importer
+# stores the SketchPoint created for the endpoint.
+class EndpointWelder:
+    def __init__(self, tolerance = DEFAULT_WELD_TOLERANCE):
+        self.tolerance = tolerance
+        self._toleranceSq = tolerance * tolerance
+        self._invCell = 1.0 / tolerance
+        self._cells = {}
+
+    def _cellOf(self, x, y, z):
+        inv = self._invCell
+        return (math.floor(x * inv), math.floor(y * inv), math.floor(z * inv))
+
+    # Returns the item stored for an endpoint within tolerance of x,y,z; otherwise None
+    def find(self, x, y, z):
+        (cx, cy, cz) = self._cellOf(x, y, z)
+        cells = self._cells
+        best = None
+        bestDistSq = self._toleranceSq
+        for (dx, dy, dz) in _NEIGHBOUR_OFFSETS:
+            entries = cells.get((cx + dx, cy + dy, cz + dz))
+            if entries == None:
+                continue
+            for (ex, ey, ez, item) in entries:
+                distSq = (ex - x) * (ex - x) + (ey - y) * (ey - y) + (ez - z) * (ez - z)
+                if distSq <= bestDistSq:
+                    best = item
+                    bestDistSq = distSq
+
+        return best
+
+    # Store item for the endpoint at x,y,z
+    def add(self, x, y, z, item):
+        self._cells.setdefault(self._cellOf(x, y, z), []).append((x, y, z, item))
+
+    # Convenience wrappers for objects with x,y,z attributes (e.g. adsk.core.Point3D)
+    def findPoint(self, pt):
+        return self.find(pt.x, pt.y, pt.z)
+
+    def addPoint(self, pt, item):
+        self.add(pt.x, pt.y, pt.z, item)